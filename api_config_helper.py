@@ -15,6 +15,44 @@ from typing import Dict, Optional
 class ConfigHelper:
     """简化的配置助手类"""
 
+    def __init__(self):
+        # 已创建的SDK客户端，按(类型, api_key, base_url)复用，保持HTTP连接
+        self._clients: Dict[tuple, object] = {}
+
+    def _get_gemini_client(self, config: Dict):
+        """获取（或创建）Gemini官方客户端"""
+        key = ('gemini', config['api_key'], None)
+        client = self._clients.get(key)
+        if client is None:
+            from google import genai
+            client = genai.Client(api_key=config['api_key'])
+            self._clients[key] = client
+        return client
+
+    def _get_openai_client(self, config: Dict):
+        """获取（或创建）OpenAI兼容客户端"""
+        key = ('openai', config['api_key'], config.get('base_url'))
+        client = self._clients.get(key)
+        if client is None:
+            from openai import OpenAI
+            client = OpenAI(
+                api_key=config['api_key'],
+                base_url=config['base_url']
+            )
+            self._clients[key] = client
+        return client
+
+    def close(self):
+        """关闭已缓存的客户端连接"""
+        for client in self._clients.values():
+            close = getattr(client, 'close', None)
+            if callable(close):
+                try:
+                    close()
+                except Exception:
+                    pass
+        self._clients.clear()
+
     def interactive_setup(self) -> Dict:
         """交互式AI配置"""
         print("\n🤖 AI接口配置")
@@ -146,10 +184,8 @@ class ConfigHelper:
     def _test_gemini_official(self, config: Dict) -> bool:
         """测试Gemini官方API"""
         try:
-            from google import genai
-
-            # 官方方式创建客户端
-            client = genai.Client(api_key=config['api_key'])
+            # 复用客户端，测试通过后的正式调用无需重新建立连接
+            client = self._get_gemini_client(config)
             response = client.models.generate_content(
                 model=config['model'], 
                 contents="测试"
@@ -165,11 +201,8 @@ class ConfigHelper:
     def _test_openai_compatible(self, config: Dict) -> bool:
         """测试OpenAI兼容API"""
         try:
-            from openai import OpenAI
-            client = OpenAI(
-                api_key=config['api_key'],
-                base_url=config['base_url']
-            )
+            # 复用客户端，测试通过后的正式调用无需重新建立连接
+            client = self._get_openai_client(config)
             response = client.chat.completions.create(
                 model=config['model'],
                 messages=[{'role': 'user', 'content': '测试'}],
@@ -209,10 +242,8 @@ class ConfigHelper:
     def _call_gemini_official(self, prompt: str, config: Dict, system_prompt: str) -> Optional[str]:
         """调用Gemini官方API"""
         try:
-            from google import genai
-
-            # 官方方式创建客户端
-            client = genai.Client(api_key=config['api_key'])
+            # 复用官方客户端
+            client = self._get_gemini_client(config)
 
             # 组合提示词
             full_prompt = f"{system_prompt}\n\n{prompt}" if system_prompt else prompt
@@ -230,11 +261,7 @@ class ConfigHelper:
     def _call_openai_compatible(self, prompt: str, config: Dict, system_prompt: str) -> Optional[str]:
         """调用OpenAI兼容API"""
         try:
-            from openai import OpenAI
-            client = OpenAI(
-                api_key=config['api_key'],
-                base_url=config['base_url']
-            )
+            client = self._get_openai_client(config)
 
             messages = []
             if system_prompt:
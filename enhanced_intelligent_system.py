@@ -27,10 +27,23 @@ import re
 import json
 import subprocess
 import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional, Tuple
 from datetime import datetime
 import requests
 
+# 提交给AI的剧情文本长度上限（字符）
+AI_CONTEXT_MAX_CHARS = 4000
+
+# 同时进行的AI请求上限（避免触发服务商限流）
+MAX_CONCURRENT_AI_CALLS = 4
+
+# SRT时间行
+_SRT_TIME_RE = re.compile(r'(\d{2}:\d{2}:\d{2}[,\.]\d{3})\s*-->\s*(\d{2}:\d{2}:\d{2}[,\.]\d{3})')
+
+# 支持的视频扩展名（按精确匹配优先级排序）
+VIDEO_EXTENSIONS = ('.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.ts')
+
 class EnhancedIntelligentTVClipper:
     def __init__(self):
         # 目录结构
@@ -50,6 +63,9 @@ class EnhancedIntelligentTVClipper:
         
         # 全剧分析缓存
         self.series_memory = {}
+
+        # 视频目录索引：小写文件名（不含扩展名）-> 路径，首次匹配时建立
+        self._video_index: Optional[Dict[str, str]] = None
         
     def load_ai_config(self) -> Dict:
         """加载AI配置"""
@@ -67,54 +83,56 @@ class EnhancedIntelligentTVClipper:
             return {'enabled': False}
     
     def parse_srt_file(self, srt_path: str) -> List[Dict]:
-        """解析SRT字幕文件"""
+        """解析SRT字幕文件（逐行流式读取，不把整个文件读入内存再分块）"""
+        subtitles = []
+        block = []
+        
         try:
-            # 尝试多种编码
-            encodings = ['utf-8', 'gbk', 'utf-16', 'gb2312']
-            content = None
-            
-            for encoding in encodings:
-                try:
-                    with open(srt_path, 'r', encoding=encoding, errors='ignore') as f:
-                        content = f.read()
-                    break
-                except:
-                    continue
-            
-            if not content:
-                return []
-            
-            # 解析SRT格式
-            blocks = re.split(r'\n\s*\n', content.strip())
-            subtitles = []
-            
-            for block in blocks:
-                lines = block.strip().split('\n')
-                if len(lines) >= 3:
-                    try:
-                        index = int(lines[0])
-                        time_match = re.search(r'(\d{2}:\d{2}:\d{2}[,\.]\d{3})\s*-->\s*(\d{2}:\d{2}:\d{2}[,\.]\d{3})', lines[1])
-                        if time_match:
-                            start_time = time_match.group(1).replace('.', ',')
-                            end_time = time_match.group(2).replace('.', ',')
-                            text = '\n'.join(lines[2:]).strip()
-                            
-                            if text:
-                                subtitles.append({
-                                    'index': index,
-                                    'start': start_time,
-                                    'end': end_time,
-                                    'text': text
-                                })
-                    except (ValueError, IndexError):
+            # 以忽略错误的UTF-8读取，按空白行划分字幕条目
+            with open(srt_path, 'r', encoding='utf-8', errors='ignore') as f:
+                for line in f:
+                    if line.strip():
+                        block.append(line.rstrip('\n'))
                         continue
+                    if block:
+                        self._append_srt_block(block, subtitles)
+                        block = []
+            
+            if block:
+                self._append_srt_block(block, subtitles)
             
             return subtitles
         
+        except OSError:
+            return []
         except Exception as e:
             print(f"解析字幕文件失败: {e}")
             return []
     
+    def _append_srt_block(self, lines: List[str], subtitles: List[Dict]):
+        """解析一个字幕条目（序号行、时间行、文本行），格式有效时追加到列表"""
+        if len(lines) < 3:
+            return
+        
+        try:
+            index = int(lines[0])
+        except ValueError:
+            return
+        
+        time_match = _SRT_TIME_RE.search(lines[1])
+        if time_match:
+            start_time = time_match.group(1).replace('.', ',')
+            end_time = time_match.group(2).replace('.', ',')
+            text = '\n'.join(lines[2:]).strip()
+            
+            if text:
+                subtitles.append({
+                    'index': index,
+                    'start': start_time,
+                    'end': end_time,
+                    'text': text
+                })
+    
     def get_cache_path(self, srt_filename: str) -> str:
         """获取缓存路径"""
         cache_name = os.path.splitext(srt_filename)[0] + '_analysis.json'
@@ -150,13 +168,12 @@ class EnhancedIntelligentTVClipper:
         if cached_result:
             return cached_result
         
-        # 合并所有字幕文本作为完整上下文
-        full_text = ' '.join([sub['text'] for sub in subtitles])
         episode_num = re.search(r'(\d+)', episode_filename)
         episode_number = episode_num.group(1) if episode_num else "00"
         
         if self.ai_config.get('enabled', False):
-            # AI分析
+            # AI分析：只合并提示词实际用到的前段字幕
+            full_text = self.build_context_text(subtitles)
             analysis_result = self.call_ai_for_complete_analysis(full_text, episode_number, subtitles)
         else:
             # 基础规则分析
@@ -166,13 +183,29 @@ class EnhancedIntelligentTVClipper:
         self.save_analysis_cache(episode_filename, analysis_result)
         return analysis_result
     
+    def build_context_text(self, subtitles: List[Dict], max_length: int = AI_CONTEXT_MAX_CHARS) -> str:
+        """按字幕边界截取上下文：整句累加直到超出长度上限，不拼接整集也不截断句子"""
+        texts = []
+        total = 0
+        for sub in subtitles:
+            text = sub['text']
+            # 已有内容时，再加一句（含分隔空格）会超限则停止
+            if texts:
+                if total + 1 + len(text) > max_length:
+                    break
+                total += 1
+            texts.append(text)
+            total += len(text)
+        
+        return ' '.join(texts)
+    
     def call_ai_for_complete_analysis(self, full_text: str, episode_num: str, subtitles: List[Dict]) -> Dict:
         """调用AI进行完整剧集分析"""
         try:
             prompt = f"""你是专业的电视剧剪辑师，请分析第{episode_num}集的完整内容，识别3-5个最精彩的连贯片段用于制作短视频。
 
 完整剧集内容：
-{full_text[:4000]}...
+{full_text[:AI_CONTEXT_MAX_CHARS]}...
 
 请分析并返回JSON格式：
 {{
@@ -188,7 +221,8 @@ class EnhancedIntelligentTVClipper:
             "emotional_intensity": 情感强度评分(1-10),
             "narrative_completeness": "叙事完整性说明",
             "connection_to_previous": "与前面剧情的联系",
-            "foreshadowing_future": "对后续剧情的铺垫"
+            "foreshadowing_future": "对后续剧情的铺垫",
+            "professional_narration": "片段解说旁白(100字以内，说明片段在剧情中的重要性、主要冲突或情感亮点、与整体故事的关联)"
         }}
     ],
     "plot_twists": ["剧情反转点描述"],
@@ -337,29 +371,55 @@ class EnhancedIntelligentTVClipper:
     def time_to_seconds(self, time_str: str) -> float:
         """时间转换为秒"""
         try:
+            # 标准定长格式 HH:MM:SS,mmm 直接按固定位置切片
+            if len(time_str) == 12 and time_str[2] == ':' and time_str[5] == ':' and time_str[8] == ',':
+                return (int(time_str[0:2]) * 3600 + int(time_str[3:5]) * 60
+                        + int(time_str[6:8]) + int(time_str[9:12]) / 1000)
+
             h, m, s_ms = time_str.split(':')
             s, ms = s_ms.split(',')
             return int(h) * 3600 + int(m) * 60 + int(s) + int(ms) / 1000
         except:
             return 0
     
+    def build_video_index(self) -> Dict[str, str]:
+        """扫描一次视频目录，建立小写文件名（不含扩展名）到路径的索引"""
+        candidates = []
+        try:
+            with os.scandir(self.videos_folder) as entries:
+                for entry in entries:
+                    base, ext = os.path.splitext(entry.name)
+                    ext = ext.lower()
+                    if ext in VIDEO_EXTENSIONS and entry.is_file():
+                        candidates.append((VIDEO_EXTENSIONS.index(ext), entry.name, base.lower()))
+        except OSError:
+            pass
+        
+        # 同名多个扩展名时按VIDEO_EXTENSIONS优先级保留
+        index = {}
+        for _, filename, key in sorted(candidates):
+            index.setdefault(key, os.path.join(self.videos_folder, filename))
+        
+        self._video_index = index
+        return index
+    
     def find_matching_video(self, srt_filename: str) -> Optional[str]:
         """找到匹配的视频文件"""
-        base_name = os.path.splitext(srt_filename)[0]
-        video_extensions = ['.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.ts']
+        video_index = self._video_index
+        if video_index is None:
+            video_index = self.build_video_index()
+        
+        base_name = os.path.splitext(srt_filename)[0].lower()
         
         # 精确匹配
-        for ext in video_extensions:
-            video_path = os.path.join(self.videos_folder, base_name + ext)
-            if os.path.exists(video_path):
-                return video_path
+        video_path = video_index.get(base_name)
+        if video_path:
+            return video_path
         
         # 模糊匹配
-        for filename in os.listdir(self.videos_folder):
-            if any(filename.lower().endswith(ext) for ext in video_extensions):
-                file_base = os.path.splitext(filename)[0]
-                if base_name.lower() in file_base.lower() or file_base.lower() in base_name.lower():
-                    return os.path.join(self.videos_folder, filename)
+        for key, video_path in video_index.items():
+            if base_name in key or key in base_name:
+                return video_path
         
         return None
     
@@ -427,6 +487,11 @@ class EnhancedIntelligentTVClipper:
         emotional_intensity = segment.get('emotional_intensity', 5)
         
         if self.ai_config.get('enabled', False):
+            # 整集分析时已一并生成旁白的片段直接使用，不再单独请求API
+            narration = segment.get('professional_narration')
+            if isinstance(narration, str) and narration.strip():
+                return narration.strip()
+            
             # AI生成旁白
             prompt = f"""为这个电视剧片段生成专业解说旁白：
 
@@ -443,9 +508,24 @@ class EnhancedIntelligentTVClipper:
 
 要求：控制在100字以内，语言生动吸引人。"""
             
+            # 相同的片段内容生成相同的提示词，按提示词内容缓存，重跑时不再请求API
+            cache_key = hashlib.md5(prompt.encode('utf-8')).hexdigest()[:16]
+            cache_path = os.path.join(self.cache_folder, f"narration_{cache_key}.json")
+            try:
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)['narration']
+            except (OSError, ValueError, KeyError):
+                pass
+
             ai_narration = self.call_ai_api(prompt)
             if ai_narration:
-                return ai_narration.strip()
+                narration = ai_narration.strip()
+                try:
+                    with open(cache_path, 'w', encoding='utf-8') as f:
+                        json.dump({'narration': narration}, f, ensure_ascii=False)
+                except OSError as e:
+                    print(f"旁白缓存保存失败: {e}")
+                return narration
         
         # 基础模板旁白
         intensity_desc = "高潮迭起" if emotional_intensity >= 8 else "紧张刺激" if emotional_intensity >= 6 else "精彩纷呈"
@@ -536,6 +616,28 @@ class EnhancedIntelligentTVClipper:
         print(f"  ✅ 完成 {len(created_clips)} 个短视频")
         return True
     
+    def prefetch_analyses(self, srt_files: List[str]):
+        """并发完成未缓存剧集的AI分析并写入缓存，之后逐集处理时直接命中缓存"""
+        if not self.ai_config.get('enabled', False):
+            return
+        
+        misses = [f for f in srt_files if not os.path.exists(self.get_cache_path(f))]
+        if len(misses) < 2:
+            return
+        
+        print(f"🤖 并发分析 {len(misses)} 集（最多同时 {MAX_CONCURRENT_AI_CALLS} 个请求）")
+        with ThreadPoolExecutor(max_workers=min(len(misses), MAX_CONCURRENT_AI_CALLS)) as executor:
+            list(executor.map(self._prefetch_analysis, misses))
+    
+    def _prefetch_analysis(self, srt_filename: str):
+        """解析字幕并完成单集分析（结果由ai_analyze_complete_episode写入缓存）"""
+        try:
+            subtitles = self.parse_srt_file(os.path.join(self.srt_folder, srt_filename))
+            if subtitles:
+                self.ai_analyze_complete_episode(subtitles, srt_filename)
+        except Exception as e:
+            print(f"  ❌ 预分析失败 {srt_filename}: {e}")
+    
     def process_all_episodes(self):
         """处理所有剧集"""
         print("🚀 智能电视剧剪辑系统启动")
@@ -562,6 +664,9 @@ class EnhancedIntelligentTVClipper:
         srt_files = [f for f in os.listdir(self.srt_folder) if f.endswith('.srt')]
         srt_files.sort()
         
+        # 视频目录只扫描一次，供各集匹配复用
+        self.build_video_index()
+        
         if not srt_files:
             print(f"❌ 在 {self.srt_folder}/ 目录中未找到SRT文件")
             print("请将字幕文件放入srt/目录，视频文件放入videos/目录")
@@ -571,6 +676,9 @@ class EnhancedIntelligentTVClipper:
         for f in srt_files:
             print(f"  • {f}")
         
+        # AI请求主要在等待网络响应，先并发完成各集分析，剪辑仍逐集进行
+        self.prefetch_analyses(srt_files)
+        
         # 处理每一集
         total_clips = 0
         processed_episodes = 0
@@ -10,6 +10,16 @@ import re
 from typing import Dict, List, Optional
 from narration_config import NARRATION_TEMPLATES, KEYWORD_MAPPING
 
+# FFmpeg drawtext中会引起转义问题的字符：删除引号、反斜杠和括号，半角冒号替换为全角
+_FFMPEG_TEXT_TABLE = str.maketrans({
+    "'": None, '"': None, '\\': None,
+    '[': None, ']': None, '(': None, ')': None,
+    ':': '：',
+})
+
+# 其余不在白名单内的字符
+_FFMPEG_UNSAFE_RE = re.compile(r'[^\w\u4e00-\u9fff\s\-_！？。，：；💡🔥]')
+
 class EnhancedNarrationGenerator:
     def __init__(self, ai_config: Dict = None):
         self.ai_config = ai_config or {}
@@ -172,11 +182,7 @@ class EnhancedNarrationGenerator:
             return ""
         
         # 移除或替换可能导致FFmpeg错误的字符
-        text = text.replace("'", "").replace('"', '')
-        text = text.replace('\\', '').replace(':', '：')
-        text = text.replace('[', '').replace(']', '')
-        text = text.replace('(', '').replace(')', '')
-        text = re.sub(r'[^\w\u4e00-\u9fff\s\-_！？。，：；💡🔥]', '', text)
+        text = _FFMPEG_UNSAFE_RE.sub('', text.translate(_FFMPEG_TEXT_TABLE))
         
         return text.strip()[:50]  # 限制长度
 
@@ -15,6 +15,7 @@
 import os
 import re
 import json
+import bisect
 import subprocess
 import requests
 from typing import List, Dict, Optional, Tuple
@@ -317,21 +318,7 @@ class IntelligentAIClipper:
         best_start_idx = 0
         best_score = 0
         
-        for i in range(len(subtitles)):
-            # 计算以当前位置为中心的片段得分
-            window_start = max(0, i - 30)
-            window_end = min(len(subtitles), i + 30)
-            
-            window_text = ' '.join([subtitles[j]['text'] for j in range(window_start, window_end)])
-            
-            score = 0
-            for key_dialogue in key_dialogues:
-                if key_dialogue.lower() in window_text.lower():
-                    score += 3
-            
-            # 对话密度评分
-            score += window_text.count('！') + window_text.count('？') * 0.5
-            
+        for window_start, score in self._window_scores(subtitles, key_dialogues, 30):
             if score > best_score:
                 best_score = score
                 best_start_idx = window_start
@@ -351,6 +338,66 @@ class IntelligentAIClipper:
             'end_time': subtitles[min(end_idx, len(subtitles)-1)]['end']
         }
 
+    def _window_scores(self, subtitles: List[Dict], key_dialogues: List[str], radius: int) -> List[Tuple[int, float]]:
+        """计算以每条字幕为中心的窗口得分，返回[(窗口起点, 得分)]
+        
+        全文只拼接一次：标点数用前缀和求差，关键对话在全文中预先定位，
+        窗口内是否包含某句对话只需二分查找，不再为每个位置重新拼接窗口文本。
+        """
+        texts = [sub['text'] for sub in subtitles]
+        lowered = [text.lower() for text in texts]
+        
+        # 每条字幕在全文（' '连接）中的起止偏移
+        starts, ends = [], []
+        offset = 0
+        for text in lowered:
+            starts.append(offset)
+            ends.append(offset + len(text))
+            offset += len(text) + 1
+        full_text = ' '.join(lowered)
+        
+        # 对话密度前缀和
+        punct_prefix = [0.0]
+        for text in texts:
+            punct_prefix.append(punct_prefix[-1] + text.count('！') + text.count('？') * 0.5)
+        
+        # 每句关键对话在全文中的所有出现位置
+        key_positions = []
+        for key_dialogue in key_dialogues:
+            key = key_dialogue.lower()
+            positions = []
+            if key:
+                pos = full_text.find(key)
+                while pos != -1:
+                    positions.append(pos)
+                    pos = full_text.find(key, pos + 1)
+            key_positions.append((key, positions))
+        
+        scores = []
+        for i in range(len(subtitles)):
+            window_start = max(0, i - radius)
+            window_end = min(len(subtitles), i + radius)
+            if window_start >= window_end:
+                continue
+            
+            text_start = starts[window_start]
+            text_end = ends[window_end - 1]
+            
+            score = 0
+            for key, positions in key_positions:
+                if not key:
+                    score += 3
+                    continue
+                # 是否存在完全落在窗口文本内的出现位置
+                idx = bisect.bisect_left(positions, text_start)
+                if idx < len(positions) and positions[idx] + len(key) <= text_end:
+                    score += 3
+            
+            score += punct_prefix[window_end] - punct_prefix[window_start]
+            scores.append((window_start, score))
+        
+        return scores
+
     def _optimize_time_range(self, subtitles: List[Dict], start_time: str, end_time: str) -> Tuple[str, str]:
         """优化时间范围，确保完整对话和合适时长"""
         
@@ -86,22 +86,38 @@ class IntelligentVideoClipper:
             
             output_path = os.path.join(self.output_folder, output_name)
             
-            # FFmpeg命令
+            # 剪切本身无需解码画面，直接流复制（-ss在-i之前按关键帧定位，缓冲时间足以覆盖偏差）；
+            # 标题叠加在add_title_overlay中统一重新编码，避免同一片段编码两次
             cmd = [
                 'ffmpeg',
-                '-i', video_file,
                 '-ss', str(buffer_start),
+                '-i', video_file,
                 '-t', str(buffer_duration),
-                '-c:v', 'libx264',
-                '-c:a', 'aac',
-                '-preset', 'medium',
-                '-crf', '23',
+                '-c', 'copy',
                 '-avoid_negative_ts', 'make_zero',
+                '-movflags', '+faststart',
                 output_path,
                 '-y'
             ]
-            
             result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+
+            if result.returncode != 0:
+                # 流复制失败时重新编码
+                cmd = [
+                    'ffmpeg',
+                    '-i', video_file,
+                    '-ss', str(buffer_start),
+                    '-t', str(buffer_duration),
+                    '-c:v', 'libx264',
+                    '-c:a', 'aac',
+                    '-preset', 'medium',
+                    '-crf', '23',
+                    '-avoid_negative_ts', 'make_zero',
+                    output_path,
+                    '-y'
+                ]
+
+                result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
             
             if result.returncode == 0 and os.path.exists(output_path):
                 file_size = os.path.getsize(output_path) / (1024*1024)
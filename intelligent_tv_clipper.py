@@ -10,12 +10,97 @@
 import os
 import re
 import json
+import pickle
 import subprocess
 import hashlib
+import heapq
+import shutil
 import requests
-from typing import List, Dict, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Optional, Set, Tuple
 from datetime import datetime
 
+from utils import clip_duration_matches, detect_subtitle_encoding, run_ffmpeg, snap_to_keyframe
+
+# 常见繁体/错别字修正（均为逐字对应）
+SUBTITLE_CORRECTIONS = {
+    '防衛': '防卫', '正當': '正当', '証據': '证据', '檢察官': '检察官',
+    '審判': '审判', '辯護': '辩护', '起訴': '起诉', '調查': '调查',
+    '發現': '发现', '決定': '决定', '選擇': '选择', '開始': '开始'
+}
+
+# 展开为单字映射，用str.translate一次完成全部修正
+_CORRECTION_TABLE = str.maketrans({
+    old_char: new_char
+    for old, new in SUBTITLE_CORRECTIONS.items()
+    for old_char, new_char in zip(old, new)
+    if old_char != new_char
+})
+
+# 并行剪辑的集数上限（每集的耗时主要在FFmpeg子进程上）
+MAX_EPISODE_WORKERS = 4
+
+# 并行AI分析的集数上限（耗时主要在等待API网络响应）
+MAX_AI_WORKERS = 8
+
+# 发给AI的字幕上下文的估算token上限（输入越长响应越慢、费用越高），超出时整集均匀抽样
+AI_CONTEXT_MAX_TOKENS = 12000
+
+# 字幕解析缓存的版本号：解析或修正规则变化时递增，旧缓存自动失效
+PARSED_CACHE_VERSION = 3
+
+# 支持的视频扩展名（按精确匹配优先级排序）
+VIDEO_EXTENSIONS = ('.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv')
+
+# 软件编码参数（重新编码的默认方案，也是硬件编码失败后的回退方案）
+LIBX264_ARGS = ['-c:v', 'libx264', '-preset', 'medium', '-crf', '23']
+
+# 可用时优先使用的硬件H.264编码器（按优先级排序）及对应的质量参数
+HW_H264_ENCODERS = [
+    ('h264_nvenc', ['-c:v', 'h264_nvenc', '-preset', 'p4', '-rc', 'vbr', '-cq', '23']),
+    ('h264_qsv', ['-c:v', 'h264_qsv', '-preset', 'medium', '-global_quality', '23']),
+    ('h264_videotoolbox', ['-c:v', 'h264_videotoolbox', '-b:v', '8M']),
+]
+
+# 片段评分用的关键词：戏剧张力词汇，以及法律剧额外加分的词汇
+DRAMA_WORDS = ('突然', '发现', '真相', '秘密', '震惊', '不可能', '原来')
+LEGAL_WORDS = ('证据', '法庭', '审判', '辩护', '案件')
+
+# 预编译的正则表达式
+_TIME_RE = re.compile(r'(\d{2}:\d{2}:\d{2}[,\.]\d{3})\s*-->\s*(\d{2}:\d{2}:\d{2}[,\.]\d{3})')
+_DIGITS_RE = re.compile(r'\d+')
+_TIMESTAMP_RE = re.compile(r'\s*(\d+):(\d+):(\d+)[,.](\d+)\s*')
+_CJK_CHAR_RE = re.compile(r'[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]')
+_SAFE_NAME_RE = re.compile(r'[^\w\u4e00-\u9fff\-_]')
+# 关键词合并为一个多选正则，一次扫描找出文本中出现的全部关键词
+_DRAMA_WORDS_RE = re.compile('|'.join(map(re.escape, DRAMA_WORDS)))
+_LEGAL_WORDS_RE = re.compile('|'.join(map(re.escape, LEGAL_WORDS)))
+# AI响应中的代码块，以及从任意位置开始解析单个JSON值的解码器
+_JSON_FENCE_RE = re.compile(r'```(?:json)?\s*(.*?)```', re.S)
+_JSON_DECODER = json.JSONDecoder()
+
+def _extract_json_object(text: str, required_keys: Tuple[str, ...] = ()) -> Optional[Dict]:
+    """从文本中找出第一个包含所需字段的JSON对象，前后的说明文字不影响解析"""
+    pos = text.find('{')
+    while pos != -1:
+        try:
+            obj, end = _JSON_DECODER.raw_decode(text, pos)
+        except ValueError:
+            pos = text.find('{', pos + 1)
+            continue
+        if isinstance(obj, dict) and all(key in obj for key in required_keys):
+            return obj
+        # 完整解析出的对象不符合要求，跳过整个对象继续查找
+        pos = text.find('{', end)
+    return None
+
+
+def _estimate_tokens(text: str) -> int:
+    """粗略估算token数：中文字符约每字1个token，其余字符约每4个1个token"""
+    cjk_count = len(_CJK_CHAR_RE.findall(text))
+    return cjk_count + (len(text) - cjk_count + 3) // 4
+
+
 class IntelligentTVClipper:
     def __init__(self):
         # 标准目录结构
@@ -31,6 +116,21 @@ class IntelligentTVClipper:
         # 加载AI配置
         self.ai_config = self._load_ai_config()
         
+        # 已创建的AI SDK客户端（按服务类型），各集复用同一连接池
+        self._ai_clients: Dict[str, object] = {}
+        
+        # 视频文件索引（小写文件名 -> 路径），每轮批处理开始时重建
+        self._video_index: Optional[Dict[str, str]] = None
+        
+        # 重新编码使用的视频编码参数（首次需要时检测）
+        self._video_encoder_args: Optional[List[str]] = None
+        
+        # 流复制起点对应的关键帧时间（(视频文件, 起始秒数) -> 关键帧秒数）
+        self._keyframe_cache: Dict[Tuple[str, float], float] = {}
+        
+        # FFmpeg可执行文件路径，启动时查找一次，各片段复用
+        self._ffmpeg_cmd = self._probe_ffmpeg()
+        
         print("🚀 智能电视剧剪辑系统 v3.0")
         print("=" * 60)
         print("✨ 核心特性：")
@@ -42,6 +142,13 @@ class IntelligentTVClipper:
         print("• 多次执行结果一致性保证")
         print("=" * 60)
 
+    def _probe_ffmpeg(self) -> Optional[str]:
+        """查找FFmpeg可执行文件，未安装时返回None"""
+        ffmpeg_cmd = shutil.which('ffmpeg')
+        if not ffmpeg_cmd:
+            print("⚠️ 未找到FFmpeg，将只进行分析不剪辑视频")
+        return ffmpeg_cmd
+
     def _load_ai_config(self) -> Dict:
         """加载AI配置"""
         try:
@@ -61,86 +168,158 @@ class IntelligentTVClipper:
         """解析SRT字幕文件，智能错误修正"""
         print(f"📖 解析字幕: {os.path.basename(filepath)}")
         
-        # 尝试多种编码
-        content = None
-        for encoding in ['utf-8', 'gbk', 'utf-16', 'gb2312']:
-            try:
-                with open(filepath, 'r', encoding=encoding, errors='ignore') as f:
-                    content = f.read()
-                    break
-            except:
-                continue
-        
-        if not content:
+        # 文件未变化（修改时间和大小一致）且解析器版本相同时直接复用上次的解析结果
+        try:
+            stat = os.stat(filepath)
+        except OSError:
             print(f"❌ 无法读取文件: {filepath}")
             return []
+        file_signature = (PARSED_CACHE_VERSION, stat.st_mtime_ns, stat.st_size)
+        parsed_cache = self._get_parsed_cache_path(filepath)
+        subtitles = self._load_parsed_subtitles(parsed_cache, file_signature)
+        if subtitles is not None:
+            print(f"💾 使用字幕解析缓存: {len(subtitles)} 条字幕")
+            return subtitles
         
-        # 智能错别字修正
-        corrections = {
-            '防衛': '防卫', '正當': '正当', '証據': '证据', '檢察官': '检察官',
-            '審判': '审判', '辯護': '辩护', '起訴': '起诉', '調查': '调查',
-            '發現': '发现', '決定': '决定', '選擇': '选择', '開始': '开始'
-        }
-        
-        for old, new in corrections.items():
-            content = content.replace(old, new)
+        # 与主程序共用同一编码检测（BOM、NUL字节、严格解码采样），再逐行流式解析
+        try:
+            encoding, errors = detect_subtitle_encoding(filepath)
+            subtitles = self._parse_srt_stream(filepath, encoding, errors)
+        except OSError:
+            print(f"❌ 无法读取文件: {filepath}")
+            return []
         
-        # 解析字幕条目
+        print(f"✅ 解析完成: {len(subtitles)} 条字幕")
+        self._save_parsed_subtitles(parsed_cache, file_signature, subtitles)
+        return subtitles
+
+    def _get_parsed_cache_path(self, filepath: str) -> str:
+        """字幕解析缓存路径，按字幕文件的绝对路径区分"""
+        path_hash = hashlib.sha1(os.path.abspath(filepath).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_folder, "parsed", f"sub_{path_hash}.pkl")
+
+    def _load_parsed_subtitles(self, cache_file: str, file_signature: Tuple[int, int, int]) -> Optional[List[Dict]]:
+        """读取解析缓存，文件或解析器版本已变化、缓存不存在或损坏时返回None"""
+        try:
+            with open(cache_file, 'rb') as f:
+                cached_signature, subtitles = pickle.load(f)
+        except Exception:
+            # 文件不存在、内容损坏或无法反序列化都按缓存未命中处理
+            return None
+        return subtitles if cached_signature == file_signature else None
+
+    def _save_parsed_subtitles(self, cache_file: str, file_signature: Tuple[int, int, int], subtitles: List[Dict]):
+        """保存解析结果（先写临时文件再替换），失败不影响本次处理"""
+        try:
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            tmp_file = cache_file + '.tmp'
+            with open(tmp_file, 'wb') as f:
+                pickle.dump((file_signature, subtitles), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_file, cache_file)
+        except Exception as e:
+            print(f"⚠️ 字幕解析缓存保存失败: {e}")
+
+    def _parse_srt_stream(self, filepath: str, encoding: str, errors: str) -> List[Dict]:
+        """按行读取字幕文件，空行结束当前条目，不在内存中保留整个文件内容"""
         subtitles = []
-        blocks = re.split(r'\n\s*\n', content.strip())
+        block = []
         
-        for block in blocks:
-            lines = block.strip().split('\n')
-            if len(lines) >= 3:
-                try:
-                    index = int(lines[0]) if lines[0].isdigit() else len(subtitles) + 1
-                    
-                    # 匹配时间格式
-                    time_pattern = r'(\d{2}:\d{2}:\d{2}[,\.]\d{3})\s*-->\s*(\d{2}:\d{2}:\d{2}[,\.]\d{3})'
-                    time_match = re.search(time_pattern, lines[1])
-                    
-                    if time_match:
-                        start_time = time_match.group(1).replace('.', ',')
-                        end_time = time_match.group(2).replace('.', ',')
-                        text = '\n'.join(lines[2:]).strip()
-                        
-                        if text:
-                            subtitles.append({
-                                'index': index,
-                                'start': start_time,
-                                'end': end_time,
-                                'text': text
-                            })
-                except (ValueError, IndexError):
-                    continue
+        with open(filepath, 'r', encoding=encoding, errors=errors) as f:
+            for line in f:
+                line = line.rstrip('\n')
+                if line.strip():
+                    block.append(line)
+                elif block:
+                    self._append_subtitle_block(block, subtitles)
+                    block = []
+        
+        if block:
+            self._append_subtitle_block(block, subtitles)
         
-        print(f"✅ 解析完成: {len(subtitles)} 条字幕")
         return subtitles
 
+    def _append_subtitle_block(self, lines: List[str], subtitles: List[Dict]):
+        """解析一个字幕条目（序号行、时间行、文本行）并追加到列表"""
+        if len(lines) < 3:
+            return
+        
+        try:
+            index = int(lines[0])
+        except ValueError:
+            index = len(subtitles) + 1
+        
+        # 匹配时间格式
+        time_match = _TIME_RE.search(lines[1])
+        
+        if time_match:
+            start_time = time_match.group(1).replace('.', ',')
+            end_time = time_match.group(2).replace('.', ',')
+            # 智能错别字修正，只处理文本部分；单行字幕（最常见）无需拼接
+            text = lines[2] if len(lines) == 3 else '\n'.join(lines[2:])
+            text = text.strip().translate(_CORRECTION_TABLE)
+            
+            if text:
+                subtitles.append({
+                    'index': index,
+                    'start': start_time,
+                    'end': end_time,
+                    'text': text
+                })
+
     def _get_cache_key(self, subtitles: List[Dict]) -> str:
-        """生成缓存键"""
+        """生成缓存键：字幕内容 + 分析方式（AI服务商和模型），更换模型后缓存自动失效"""
+        if self.ai_config.get('enabled', False):
+            analyzer = f"{self.ai_config.get('provider', '')}:{self.ai_config.get('model', '')}"
+        else:
+            analyzer = "basic"
         content = json.dumps(subtitles, ensure_ascii=False, sort_keys=True)
-        return hashlib.md5(content.encode()).hexdigest()[:16]
+        return hashlib.sha256(f"{analyzer}\n{content}".encode()).hexdigest()[:16]
 
-    def _load_cache(self, cache_key: str, episode_name: str) -> Optional[Dict]:
-        """加载分析缓存"""
-        cache_file = os.path.join(self.cache_folder, f"{episode_name}_{cache_key}.json")
+    def _get_content_cache_path(self, cache_key: str) -> str:
+        """按内容寻址的缓存路径（与文件名无关）"""
+        return os.path.join(self.cache_folder, "by_content", f"{cache_key}.json")
+
+    def _read_cache_file(self, cache_file: str) -> Optional[Dict]:
+        """读取缓存文件，不存在或损坏时返回None"""
         if os.path.exists(cache_file):
             try:
                 with open(cache_file, 'r', encoding='utf-8') as f:
-                    analysis = json.load(f)
-                    print(f"💾 使用缓存分析: {episode_name}")
-                    return analysis
+                    return json.load(f)
             except Exception as e:
                 print(f"⚠️ 缓存读取失败: {e}")
         return None
 
+    def _write_cache_file(self, cache_file: str, analysis: Dict):
+        """先写临时文件再替换，中断时不会留下半个缓存文件"""
+        tmp_file = cache_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(analysis, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, cache_file)
+
+    def _load_cache(self, cache_key: str, episode_name: str) -> Optional[Dict]:
+        """加载分析缓存"""
+        cache_file = os.path.join(self.cache_folder, f"{episode_name}_{cache_key}.json")
+        analysis = self._read_cache_file(cache_file)
+        if analysis is not None:
+            print(f"💾 使用缓存分析: {episode_name}")
+            return analysis
+        
+        # 相同字幕内容换了文件名（重命名、重复上传）：复用内容缓存，集数改为当前文件
+        analysis = self._read_cache_file(self._get_content_cache_path(cache_key))
+        if analysis is not None:
+            if isinstance(analysis.get('episode_analysis'), dict):
+                analysis['episode_analysis']['episode_number'] = self._extract_episode_number(episode_name)
+            print(f"💾 复用相同内容的缓存分析: {episode_name}")
+        return analysis
+
     def _save_cache(self, cache_key: str, episode_name: str, analysis: Dict):
-        """保存分析缓存"""
+        """保存分析缓存（按文件名和按内容各一份）"""
         cache_file = os.path.join(self.cache_folder, f"{episode_name}_{cache_key}.json")
+        content_file = self._get_content_cache_path(cache_key)
         try:
-            with open(cache_file, 'w', encoding='utf-8') as f:
-                json.dump(analysis, f, ensure_ascii=False, indent=2)
+            os.makedirs(os.path.dirname(content_file), exist_ok=True)
+            self._write_cache_file(cache_file, analysis)
+            self._write_cache_file(content_file, analysis)
             print(f"💾 保存分析缓存: {episode_name}")
         except Exception as e:
             print(f"⚠️ 缓存保存失败: {e}")
@@ -160,6 +339,9 @@ class IntelligentTVClipper:
         
         if self.ai_config.get('enabled', False):
             analysis = self._call_ai_analysis(full_context, episode_num, episode_name)
+            if analysis is None:
+                # AI失败时降级到基础分析，但不缓存，下次运行重新请求AI
+                return self._basic_analysis_fallback(subtitles, episode_num, episode_name)
         else:
             analysis = self._basic_analysis_fallback(subtitles, episode_num, episode_name)
         
@@ -169,20 +351,37 @@ class IntelligentTVClipper:
         return analysis
 
     def _build_complete_context(self, subtitles: List[Dict]) -> str:
-        """构建完整上下文，避免割裂"""
-        # 将所有字幕合并为完整文本，保持时间信息
+        """构建上下文：保持时间信息且不截断句子，超出token预算时在整集范围内均匀抽样"""
+        lines = [f"[{sub['start']} --> {sub['end']}] {sub['text']}" for sub in subtitles]
+        line_tokens = [_estimate_tokens(line) for line in lines]
+        
+        # 按固定步长抽取整句，使后半集的场景同样能被AI选中
+        stride = 1
+        while stride < len(lines) and sum(line_tokens[::stride]) > AI_CONTEXT_MAX_TOKENS:
+            stride += 1
+        
         context_parts = []
+        segment_lines = []
+        total_tokens = 0
+        
+        for i in range(0, len(lines), stride):
+            if total_tokens + line_tokens[i] > AI_CONTEXT_MAX_TOKENS:
+                break
+            total_tokens += line_tokens[i]
+            segment_lines.append(lines[i])
+            
+            # 每50句原字幕分一段，保持场景划分
+            if (i + stride) // 50 != i // 50:
+                context_parts.append('\n'.join(segment_lines))
+                segment_lines = []
         
-        # 每50句分一段，保持上下文
-        for i in range(0, len(subtitles), 50):
-            segment = subtitles[i:i+50]
-            segment_text = '\n'.join([f"[{sub['start']} --> {sub['end']}] {sub['text']}" for sub in segment])
-            context_parts.append(segment_text)
+        if segment_lines:
+            context_parts.append('\n'.join(segment_lines))
         
         return '\n\n=== 场景分割 ===\n\n'.join(context_parts)
 
-    def _call_ai_analysis(self, context: str, episode_num: str, episode_name: str) -> Dict:
-        """调用AI进行完整分析"""
+    def _call_ai_analysis(self, context: str, episode_num: str, episode_name: str) -> Optional[Dict]:
+        """调用AI进行完整分析，失败返回None"""
         prompt = f"""你是专业的电视剧剪辑师，需要为第{episode_num}集创建多个2-3分钟的精彩短视频。
 
 【完整剧情内容】
@@ -244,8 +443,7 @@ class IntelligentTVClipper:
         except Exception as e:
             print(f"⚠️ AI分析失败: {e}")
         
-        # 降级到基础分析
-        return self._basic_analysis_fallback(subtitles, episode_num, episode_name)
+        return None
 
     def _call_ai_api(self, prompt: str) -> Optional[str]:
         """统一AI API调用"""
@@ -262,14 +460,29 @@ class IntelligentTVClipper:
             print(f"⚠️ API调用异常: {e}")
             return None
 
+    def _get_ai_client(self, kind: str, config: Dict):
+        """获取（或首次创建）AI客户端，避免每次调用重新建立连接"""
+        client = self._ai_clients.get(kind)
+        if client is None:
+            if kind == 'gemini':
+                from google import genai
+                client = genai.Client(api_key=config['api_key'])
+            else:
+                from openai import OpenAI
+                client = OpenAI(
+                    api_key=config['api_key'],
+                    base_url=config.get('base_url', 'https://api.openai.com/v1')
+                )
+            self._ai_clients[kind] = client
+        return client
+
     def _call_official_api(self, prompt: str, config: Dict) -> Optional[str]:
         """调用官方API"""
         provider = config.get('provider', 'openai')
         
         if provider == 'gemini':
             try:
-                from google import genai
-                client = genai.Client(api_key=config['api_key'])
+                client = self._get_ai_client('gemini', config)
                 response = client.models.generate_content(
                     model=config.get('model', 'gemini-2.5-flash'),
                     contents=prompt
@@ -285,12 +498,7 @@ class IntelligentTVClipper:
     def _call_proxy_api(self, prompt: str, config: Dict) -> Optional[str]:
         """调用代理API"""
         try:
-            from openai import OpenAI
-            
-            client = OpenAI(
-                api_key=config['api_key'],
-                base_url=config.get('base_url', 'https://api.openai.com/v1')
-            )
+            client = self._get_ai_client('openai', config)
             
             response = client.chat.completions.create(
                 model=config.get('model', 'gpt-3.5-turbo'),
@@ -310,27 +518,19 @@ class IntelligentTVClipper:
 
     def _parse_ai_response(self, response: str) -> Optional[Dict]:
         """解析AI响应"""
-        try:
-            # 提取JSON内容
-            if "```json" in response:
-                start = response.find("```json") + 7
-                end = response.find("```", start)
-                json_text = response[start:end]
-            else:
-                start = response.find("{")
-                end = response.rfind("}") + 1
-                json_text = response[start:end]
-            
-            analysis = json.loads(json_text)
-            
-            # 验证必要字段
-            if 'highlight_segments' in analysis and 'episode_analysis' in analysis:
+        required_keys = ('highlight_segments', 'episode_analysis')
+        
+        # 优先解析代码块内容，再在整段响应中查找
+        fence = _JSON_FENCE_RE.search(response)
+        if fence:
+            analysis = _extract_json_object(fence.group(1), required_keys)
+            if analysis is not None:
                 return analysis
-                
-        except json.JSONDecodeError as e:
-            print(f"⚠️ JSON解析失败: {e}")
         
-        return None
+        analysis = _extract_json_object(response, required_keys)
+        if analysis is None:
+            print("⚠️ JSON解析失败: 未找到有效的分析结果")
+        return analysis
 
     def _basic_analysis_fallback(self, subtitles: List[Dict], episode_num: str, episode_name: str) -> Dict:
         """基础分析备选方案"""
@@ -341,7 +541,7 @@ class IntelligentTVClipper:
         genre = self._detect_genre(full_text)
         
         # 智能片段选择
-        segments = self._select_segments(subtitles, genre)
+        segments = self._select_segments(subtitles, genre, episode_num)
         
         return {
             "episode_analysis": {
@@ -380,38 +580,34 @@ class IntelligentTVClipper:
         
         return detected_genre
 
-    def _select_segments(self, subtitles: List[Dict], genre: str) -> List[Dict]:
+    def _select_segments(self, subtitles: List[Dict], genre: str, episode_num: str) -> List[Dict]:
         """智能选择片段"""
-        # 基于关键词和情感强度评分
-        high_score_indices = []
-        
-        for i, sub in enumerate(subtitles):
-            score = self._calculate_segment_score(sub['text'], genre)
-            if score >= 5:
-                high_score_indices.append((i, score))
+        # 基于关键词和情感强度评分，一遍扫描得到高分字幕
+        high_score_indices = [
+            (i, score)
+            for i, score in enumerate(self._calculate_segment_score(sub['text'], genre) for sub in subtitles)
+            if score >= 5
+        ]
         
-        # 按评分排序
-        high_score_indices.sort(key=lambda x: x[1], reverse=True)
+        # 选择前3个高分区域（只取前3，无需整体排序；同分时保持字幕顺序）
+        top_indices = heapq.nlargest(3, high_score_indices, key=lambda x: x[1])
         
-        # 选择前3个高分区域
         segments = []
-        for j, (center_idx, score) in enumerate(high_score_indices[:3]):
+        for j, (center_idx, score) in enumerate(top_indices):
             # 扩展到合适长度
             start_idx = max(0, center_idx - 25)
             end_idx = min(len(subtitles) - 1, center_idx + 25)
+            start_seconds = self._time_to_seconds(subtitles[start_idx]['start'])
             
             # 确保最少2分钟
-            while end_idx < len(subtitles) - 1:
-                duration = self._time_to_seconds(subtitles[end_idx]['end']) - self._time_to_seconds(subtitles[start_idx]['start'])
-                if duration >= 120:
-                    break
+            duration = self._time_to_seconds(subtitles[end_idx]['end']) - start_seconds
+            while duration < 120 and end_idx < len(subtitles) - 1:
                 end_idx += 1
-            
-            duration = self._time_to_seconds(subtitles[end_idx]['end']) - self._time_to_seconds(subtitles[start_idx]['start'])
+                duration = self._time_to_seconds(subtitles[end_idx]['end']) - start_seconds
             
             segments.append({
                 "segment_id": j + 1,
-                "title": f"第{self._extract_episode_number('test')}集精彩片段{j+1}",
+                "title": f"第{episode_num}集精彩片段{j+1}",
                 "start_time": subtitles[start_idx]['start'],
                 "end_time": subtitles[end_idx]['end'],
                 "duration_seconds": duration,
@@ -437,50 +633,67 @@ class IntelligentTVClipper:
         score += text.count('！') * 2
         score += text.count('？') * 1.5
         
-        # 戏剧张力词汇
-        drama_words = ['突然', '发现', '真相', '秘密', '震惊', '不可能', '原来']
-        for word in drama_words:
-            if word in text:
-                score += 3
+        # 戏剧张力词汇（每个词出现即加分，不重复计）
+        score += 3 * len(set(_DRAMA_WORDS_RE.findall(text)))
         
         # 根据剧情类型调整
         if genre == '法律剧':
-            legal_words = ['证据', '法庭', '审判', '辩护', '案件']
-            for word in legal_words:
-                if word in text:
-                    score += 2
+            score += 2 * len(set(_LEGAL_WORDS_RE.findall(text)))
         
         return score
 
+    def _build_video_index(self) -> Dict[str, str]:
+        """用os.scandir扫描一次视频目录，建立小写文件名（不含扩展名）到路径的索引"""
+        candidates = []
+        try:
+            with os.scandir(self.videos_folder) as entries:
+                for entry in entries:
+                    base, ext = os.path.splitext(entry.name)
+                    ext = ext.lower()
+                    if ext in VIDEO_EXTENSIONS and entry.is_file():
+                        candidates.append((VIDEO_EXTENSIONS.index(ext), entry.name, base.lower()))
+        except OSError:
+            pass
+        
+        # 同名多个扩展名时按VIDEO_EXTENSIONS优先级保留
+        index = {}
+        for _, filename, key in sorted(candidates):
+            index.setdefault(key, os.path.join(self.videos_folder, filename))
+        
+        self._video_index = index
+        return index
+
     def find_matching_video(self, srt_filename: str) -> Optional[str]:
         """智能匹配视频文件"""
-        base_name = os.path.splitext(srt_filename)[0]
+        video_index = self._video_index
+        if video_index is None:
+            video_index = self._build_video_index()
+        
+        base_name = os.path.splitext(srt_filename)[0].lower()
         
         # 精确匹配
-        video_extensions = ['.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv']
-        for ext in video_extensions:
-            video_path = os.path.join(self.videos_folder, base_name + ext)
-            if os.path.exists(video_path):
-                return video_path
+        video_path = video_index.get(base_name)
+        if video_path:
+            return video_path
         
         # 模糊匹配
-        for filename in os.listdir(self.videos_folder):
-            if any(filename.lower().endswith(ext) for ext in video_extensions):
-                if base_name.lower() in filename.lower():
-                    return os.path.join(self.videos_folder, filename)
+        for key, video_path in video_index.items():
+            if base_name in key:
+                return video_path
         
         return None
 
     def create_episode_clips(self, analysis: Dict, video_file: str, srt_filename: str) -> List[str]:
         """创建集数短视频 - 解决问题4,5,13,14"""
         created_clips = []
+        pending = []
         
         for segment in analysis.get('highlight_segments', []):
             segment_id = segment['segment_id']
             title = segment['title']
             
             # 生成一致的文件名 - 解决问题13
-            safe_title = re.sub(r'[^\w\u4e00-\u9fff\-_]', '_', title)
+            safe_title = _SAFE_NAME_RE.sub('_', title)
             clip_filename = f"{safe_title}_seg{segment_id}.mp4"
             clip_path = os.path.join(self.output_folder, clip_filename)
             
@@ -490,16 +703,87 @@ class IntelligentTVClipper:
                 created_clips.append(clip_path)
                 continue
             
+            pending.append((segment, clip_path))
+        
+        if pending and not self._ffmpeg_cmd:
+            print(f"⚠️ FFmpeg不可用，跳过 {len(pending)} 个片段的剪辑")
+            return created_clips
+        
+        # 多个片段时先用一次FFmpeg调用批量流复制，失败的片段再逐个处理
+        batched = self._create_clips_batch(video_file, pending) if len(pending) > 1 else set()
+        
+        for segment, clip_path in pending:
             # 剪辑视频
-            if self._create_single_clip(video_file, segment, clip_path):
+            if clip_path in batched or self._create_single_clip(video_file, segment, clip_path):
                 created_clips.append(clip_path)
                 # 生成旁白文件 - 解决问题7
                 self._create_narration_file(clip_path, segment)
         
         return created_clips
 
+    def _clip_window(self, segment: Dict) -> Optional[Tuple[float, float]]:
+        """计算带缓冲的剪辑起点和时长，时间段无效时返回None"""
+        start_seconds = self._time_to_seconds(segment['start_time'])
+        duration = self._time_to_seconds(segment['end_time']) - start_seconds
+        if duration <= 0:
+            return None
+        
+        # 添加缓冲确保对话完整 - 解决问题11
+        return max(0, start_seconds - 1), duration + 2
+
+    def _create_clips_batch(self, video_file: str, jobs: List[Tuple[Dict, str]]) -> Set[str]:
+        """一次FFmpeg调用流复制多个片段，返回成功生成的片段路径集合"""
+        cmd = [self._ffmpeg_cmd, '-hide_banner', '-loglevel', 'error']
+        outputs = []
+        
+        # 每个片段对应一个带-ss/-t的输入，源视频只启动一个进程处理
+        for segment, clip_path in jobs:
+            window = self._clip_window(segment)
+            if window is None:
+                continue
+            copy_start, copy_duration = snap_to_keyframe(video_file, *window, self._keyframe_cache)
+            cmd += ['-ss', str(copy_start), '-t', str(copy_duration), '-i', video_file]
+            outputs.append((clip_path, copy_duration))
+        
+        if len(outputs) < 2:
+            return set()
+        
+        for input_index, (clip_path, _) in enumerate(outputs):
+            cmd += [
+                '-map', f'{input_index}:v:0',
+                '-map', f'{input_index}:a:0?',
+                '-c', 'copy',
+                '-avoid_negative_ts', 'make_zero',
+                '-movflags', '+faststart',
+                clip_path
+            ]
+        cmd.append('-y')
+        
+        print(f"🎬 批量剪辑 {len(outputs)} 个片段")
+        try:
+            result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=600)
+        except (OSError, subprocess.SubprocessError) as e:
+            print(f"   ↪️ 批量剪辑异常，改为逐个处理: {e}")
+            return set()
+        
+        if result.returncode != 0:
+            print(f"   ↪️ 批量剪辑失败，改为逐个处理")
+            return set()
+        
+        succeeded = set()
+        for clip_path, copy_duration in outputs:
+            if os.path.exists(clip_path) and clip_duration_matches(clip_path, copy_duration):
+                file_size = os.path.getsize(clip_path) / (1024*1024)
+                print(f"   ✅ {os.path.basename(clip_path)}: {file_size:.1f}MB")
+                succeeded.add(clip_path)
+        
+        return succeeded
+
     def _create_single_clip(self, video_file: str, segment: Dict, output_path: str) -> bool:
-        """创建单个视频片段"""
+        """创建单个视频片段（默认流复制，失败或时长偏差过大时重新编码）"""
+        if not self._ffmpeg_cmd:
+            return False
+        
         try:
             start_time = segment['start_time']
             end_time = segment['end_time']
@@ -507,54 +791,106 @@ class IntelligentTVClipper:
             print(f"🎬 剪辑片段: {os.path.basename(output_path)}")
             print(f"   时间: {start_time} --> {end_time}")
             
-            # 时间转换
-            start_seconds = self._time_to_seconds(start_time)
-            end_seconds = self._time_to_seconds(end_time)
-            duration = end_seconds - start_seconds
-            
-            if duration <= 0:
+            window = self._clip_window(segment)
+            if window is None:
                 print(f"   ❌ 无效时间段")
                 return False
+            buffer_start, buffer_duration = window
             
-            # 添加缓冲确保对话完整 - 解决问题11
-            buffer_start = max(0, start_seconds - 1)
-            buffer_duration = duration + 2
-            
-            # FFmpeg命令
-            cmd = [
-                'ffmpeg',
+            # 先流复制：-ss放在-i之前按关键帧快速定位，不做解码和编码
+            copy_start, copy_duration = snap_to_keyframe(video_file, buffer_start, buffer_duration, self._keyframe_cache)
+            copy_cmd = [
+                self._ffmpeg_cmd,
+                '-hide_banner',
+                '-loglevel', 'error',
+                '-ss', str(copy_start),
                 '-i', video_file,
-                '-ss', str(buffer_start),
-                '-t', str(buffer_duration),
-                '-c:v', 'libx264',
-                '-c:a', 'aac',
-                '-preset', 'medium',
-                '-crf', '23',
+                '-t', str(copy_duration),
+                '-c', 'copy',
+                '-avoid_negative_ts', 'make_zero',
                 '-movflags', '+faststart',
                 output_path,
                 '-y'
             ]
             
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+            success, _ = run_ffmpeg(copy_cmd, output_path, max_error_chars=100)
+            if success and clip_duration_matches(output_path, copy_duration):
+                file_size = os.path.getsize(output_path) / (1024*1024)
+                print(f"   ✅ 成功(流复制): {file_size:.1f}MB")
+                return True
+            
+            print(f"   ↪️ 流复制不可用，改为重新编码")
             
-            if result.returncode == 0 and os.path.exists(output_path):
+            # 重新编码：-ss放在-i之后，精确剪切
+            encoder_args = self._get_video_encoder_args()
+            cmd = self._build_encode_cmd(video_file, buffer_start, buffer_duration, encoder_args, output_path)
+            
+            success, error_msg = run_ffmpeg(cmd, output_path, max_error_chars=100)
+            if not success and encoder_args is not LIBX264_ARGS:
+                # 编码器已编译但没有可用硬件时会失败，之后统一改用软件编码
+                print(f"   ↪️ 硬件编码失败，改用libx264")
+                self._video_encoder_args = LIBX264_ARGS
+                cmd = self._build_encode_cmd(video_file, buffer_start, buffer_duration, LIBX264_ARGS, output_path)
+                success, error_msg = run_ffmpeg(cmd, output_path, max_error_chars=100)
+            
+            if success:
                 file_size = os.path.getsize(output_path) / (1024*1024)
                 print(f"   ✅ 成功: {file_size:.1f}MB")
                 return True
             else:
-                print(f"   ❌ 失败: {result.stderr[:100] if result.stderr else '未知错误'}")
+                print(f"   ❌ 失败: {error_msg}")
                 return False
                 
         except Exception as e:
             print(f"   ❌ 剪辑异常: {e}")
             return False
 
+    def _build_encode_cmd(self, video_file: str, start_seconds: float, duration: float,
+                          encoder_args: List[str], output_path: str) -> List[str]:
+        """构建重新编码的FFmpeg命令"""
+        return [
+            self._ffmpeg_cmd,
+            '-hide_banner',
+            '-loglevel', 'error',
+            '-i', video_file,
+            '-ss', str(start_seconds),
+            '-t', str(duration),
+            *encoder_args,
+            '-c:a', 'aac',
+            '-movflags', '+faststart',
+            output_path,
+            '-y'
+        ]
+
+    def _get_video_encoder_args(self) -> List[str]:
+        """返回重新编码的视频编码参数：首次调用时检测硬件编码器，之后复用结果"""
+        if self._video_encoder_args is None:
+            encoder_args = LIBX264_ARGS
+            try:
+                result = subprocess.run(
+                    [self._ffmpeg_cmd, '-hide_banner', '-encoders'],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL,
+                    timeout=30
+                )
+                encoders = result.stdout.decode('utf-8', 'replace')
+                for name, args in HW_H264_ENCODERS:
+                    if name in encoders:
+                        print(f"   ⚡ 使用硬件编码器: {name}")
+                        encoder_args = args
+                        break
+            except (OSError, subprocess.SubprocessError):
+                pass
+            self._video_encoder_args = encoder_args
+        return self._video_encoder_args
+
     def _create_narration_file(self, video_path: str, segment: Dict):
         """创建旁白文件 - 解决问题7,10"""
         try:
             narration_path = video_path.replace('.mp4', '_旁白.txt')
             
             narration = segment.get('narration', {})
+            dialogues_block = "".join(f"• {dialogue}\n" for dialogue in segment.get('key_dialogues', []))
             
             content = f"""🎬 {segment['title']}
 {'=' * 50}
@@ -570,12 +906,7 @@ class IntelligentTVClipper:
 【结尾】{narration.get('conclusion', '')}
 
 💬 关键对话:
-"""
-            
-            for dialogue in segment.get('key_dialogues', []):
-                content += f"• {dialogue}\n"
-            
-            content += f"""
+{dialogues_block}
 
 📖 内容描述:
 {segment['description']}
@@ -598,7 +929,7 @@ class IntelligentTVClipper:
         base_name = os.path.splitext(filename)[0]
         
         # 尝试提取数字
-        numbers = re.findall(r'\d+', base_name)
+        numbers = _DIGITS_RE.findall(base_name)
         if numbers:
             return numbers[-1].zfill(2)  # 取最后一个数字，补零对齐
         
@@ -606,16 +937,21 @@ class IntelligentTVClipper:
 
     def _time_to_seconds(self, time_str: str) -> float:
         """时间转换为秒"""
-        try:
-            time_str = time_str.replace('.', ',')
-            h, m, s_ms = time_str.split(':')
-            s, ms = s_ms.split(',')
-            return int(h) * 3600 + int(m) * 60 + int(s) + int(ms) / 1000
-        except:
+        match = _TIMESTAMP_RE.fullmatch(time_str)
+        if not match:
             return 0.0
+        h, m, s, ms = match.groups()
+        return int(h) * 3600 + int(m) * 60 + int(s) + int(ms) / 1000
+
+    def process_single_episode(self, srt_file: str) -> int:
+        """处理单集完整流程 - 解决问题15：执行一致性，返回生成的片段数"""
+        analysis = self.analyze_episode(srt_file)
+        if analysis is None:
+            return 0
+        return self.clip_episode(srt_file, analysis)
 
-    def process_single_episode(self, srt_file: str) -> bool:
-        """处理单集完整流程 - 解决问题15：执行一致性"""
+    def analyze_episode(self, srt_file: str) -> Optional[Dict]:
+        """解析字幕并分析单集，字幕解析失败时返回None"""
         print(f"\n📺 处理: {srt_file}")
         
         # 1. 解析字幕
@@ -624,16 +960,18 @@ class IntelligentTVClipper:
         
         if not subtitles:
             print(f"❌ 字幕解析失败")
-            return False
+            return None
         
         # 2. AI分析 (带缓存)
-        analysis = self.ai_analyze_complete_episode(subtitles, srt_file)
-        
+        return self.ai_analyze_complete_episode(subtitles, srt_file)
+
+    def clip_episode(self, srt_file: str, analysis: Dict) -> int:
+        """按分析结果剪辑单集并生成总结，返回生成的片段数"""
         # 3. 找到视频文件
         video_file = self.find_matching_video(srt_file)
         if not video_file:
             print(f"❌ 未找到视频文件")
-            return False
+            return 0
         
         print(f"📁 视频文件: {os.path.basename(video_file)}")
         
@@ -644,7 +982,7 @@ class IntelligentTVClipper:
         self._create_episode_summary(srt_file, analysis, created_clips)
         
         print(f"✅ {srt_file} 处理完成: {len(created_clips)} 个片段")
-        return len(created_clips) > 0
+        return len(created_clips)
 
     def _create_episode_summary(self, srt_file: str, analysis: Dict, clips: List[str]):
         """创建集数总结"""
@@ -700,37 +1038,57 @@ class IntelligentTVClipper:
         print("🚀 智能电视剧剪辑系统启动")
         print("=" * 60)
         
-        # 获取所有SRT文件，按文件名排序 - 解决问题2
-        srt_files = [f for f in os.listdir(self.srt_folder) 
-                     if f.endswith(('.srt', '.txt')) and not f.startswith('.')]
+        # 获取所有SRT文件，按文件名排序确保集数顺序 - 解决问题2
+        with os.scandir(self.srt_folder) as entries:
+            srt_files = sorted(
+                entry.name for entry in entries
+                if entry.name.endswith(('.srt', '.txt')) and not entry.name.startswith('.')
+                and entry.is_file()
+            )
         
         if not srt_files:
             print(f"❌ {self.srt_folder}/ 目录中未找到字幕文件")
             return
         
-        # 按文件名排序确保集数顺序
-        srt_files.sort()
-        
         print(f"📝 找到 {len(srt_files)} 个字幕文件")
+        
+        # 视频目录只扫描一次，供各集匹配复用
+        self._build_video_index()
         print(f"🤖 AI分析: {'启用' if self.ai_config.get('enabled') else '未启用'}")
         
         # 处理每一集
         total_success = 0
         total_clips = 0
         
-        for srt_file in srt_files:
-            try:
-                success = self.process_single_episode(srt_file)
-                if success:
-                    total_success += 1
-                
-                # 统计片段数
-                episode_clips = [f for f in os.listdir(self.output_folder) 
-                               if f.startswith(os.path.splitext(srt_file)[0]) and f.endswith('.mp4')]
-                total_clips += len(episode_clips)
-                
-            except Exception as e:
-                print(f"❌ 处理 {srt_file} 出错: {e}")
+        # 第一阶段：各集的AI分析主要在等待网络响应，用更多线程并发请求
+        analyses = {}
+        max_workers = max(1, min(len(srt_files), MAX_AI_WORKERS))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(self.analyze_episode, f): f for f in srt_files}
+            for future in as_completed(futures):
+                srt_file = futures[future]
+                try:
+                    analysis = future.result()
+                    if analysis is not None:
+                        analyses[srt_file] = analysis
+                except Exception as e:
+                    print(f"❌ 分析 {srt_file} 出错: {e}")
+        
+        # 第二阶段：剪辑受FFmpeg的CPU占用限制，并发数按CPU核数控制
+        clip_files = [f for f in srt_files if f in analyses]
+        max_workers = max(1, min(len(clip_files), MAX_EPISODE_WORKERS, os.cpu_count() or 1))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(self.clip_episode, f, analyses[f]): f for f in clip_files}
+            for future in as_completed(futures):
+                srt_file = futures[future]
+                try:
+                    clip_count = future.result()
+                    if clip_count > 0:
+                        total_success += 1
+                    total_clips += clip_count
+                    
+                except Exception as e:
+                    print(f"❌ 处理 {srt_file} 出错: {e}")
         
         # 最终报告
         self._create_final_report(total_success, len(srt_files), total_clips)
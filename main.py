@@ -10,11 +10,172 @@ import os
 import re
 import json
 import hashlib
+import importlib.util
+import shutil
 import subprocess
 import sys
-from typing import List, Dict, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Set, Tuple
 from datetime import datetime
 
+from utils import clip_duration_matches, detect_subtitle_encoding, run_ffmpeg, snap_to_keyframe
+
+# 可选依赖：安装了orjson时用它读写分析缓存，否则使用标准库json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 支持的视频扩展名（按精确匹配优先级排序）
+VIDEO_EXTENSIONS = ('.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv')
+SUBTITLE_EXTENSIONS = ('.srt', '.txt')
+
+# 并行处理的集数上限，以及同时进行的AI请求上限（避免触发服务商限流）
+MAX_EPISODE_WORKERS = 4
+MAX_CONCURRENT_AI_CALLS = 4
+
+# 单集内同时运行的FFmpeg剪辑进程上限（编码器本身多线程，再按CPU核数的一半限制）
+MAX_PARALLEL_CLIPS = 2
+
+# libx264编码速度预设：输出的是预览用短片段，fast比medium快约40%，画质损失很小
+LIBX264_PRESET = 'fast'
+
+# 软件编码参数（重新编码的默认方案，也是硬件编码失败后的回退方案）
+LIBX264_ARGS = ['-c:v', 'libx264', '-preset', LIBX264_PRESET, '-crf', '23']
+
+# Linux下VAAPI编码使用的渲染设备
+VAAPI_DEVICE = '/dev/dri/renderD128'
+
+# 可用时优先使用的硬件H.264编码器（按优先级排序）及对应的质量参数
+HW_H264_ENCODERS = [
+    ('h264_nvenc', ['-c:v', 'h264_nvenc', '-preset', 'p4', '-rc', 'vbr', '-cq', '23']),
+    ('h264_qsv', ['-c:v', 'h264_qsv', '-preset', 'medium', '-global_quality', '23']),
+    # VAAPI需要先把解码后的帧上传到GPU
+    ('h264_vaapi', ['-vaapi_device', VAAPI_DEVICE, '-vf', 'format=nv12,hwupload',
+                    '-c:v', 'h264_vaapi', '-qp', '23']),
+    ('h264_videotoolbox', ['-c:v', 'h264_videotoolbox', '-b:v', '8M']),
+]
+
+# 启动时检查的依赖：pip包名 -> 导入时的模块名
+REQUIRED_PACKAGES = {
+    'openai': 'openai',
+    'google-generativeai': 'google.generativeai',
+}
+
+# 分块读取字幕（计算内容哈希）时每次读取的大小
+ENCODING_PROBE_CHUNK = 1024 * 1024
+
+# 片段标题中不能出现在文件名里的字符
+_SAFE_TITLE_RE = re.compile(r'[^\w\u4e00-\u9fff\-_]')
+
+# AI分析提示词：固定的说明部分在前，每集变化的集数和字幕放在最后，
+# 便于服务商对相同前缀做提示词缓存
+AI_SYSTEM_PROMPT = "你是专业的影视剪辑师和内容分析专家，擅长识别电视剧中的精彩片段。请严格按照JSON格式输出。"
+
+EPISODE_ANALYSIS_PROMPT = """你是资深电视剧剪辑师，需要分析下面给出的一集内容，找出最适合制作短视频的精彩片段。
+
+【分析要求】
+1. 找出3-5个最精彩的片段，每个片段时长2-3分钟
+2. 优先选择戏剧冲突强烈、情感张力大的场景
+3. 确保片段有完整的故事起承转合
+4. 每个片段都要有吸引观众的亮点
+
+【输出格式】
+请严格按照JSON格式输出：
+
+{{
+    "episode_analysis": {{
+        "episode_number": "集数",
+        "genre_type": "推测的剧情类型",
+        "main_theme": "本集核心主题"
+    }},
+    "highlight_segments": [
+        {{
+            "segment_id": 1,
+            "title": "吸引人的片段标题",
+            "start_time": "精确的开始时间（格式：00:XX:XX,XXX）",
+            "end_time": "精确的结束时间（格式：00:XX:XX,XXX）",
+            "duration_seconds": 片段时长秒数,
+            "plot_significance": "这个片段在剧情中的重要作用",
+            "professional_narration": "为这个片段写的专业解说词",
+            "highlight_tip": "一句话提示观众关注的精彩点",
+            "content_summary": "片段内容简要概括"
+        }}
+    ]
+}}
+
+【集数】{episode_num}
+
+【剧集字幕内容】
+{full_context}"""
+
+# AI响应中的 ```json 代码块
+_JSON_FENCE_RE = re.compile(r'```(?:json)?\s*(.*?)```', re.S)
+_JSON_DECODER = json.JSONDecoder()
+
+
+def _dump_json_bytes(data) -> bytes:
+    """序列化为带缩进的UTF-8 JSON字节串"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+def _extract_json_object(text: str, required_keys: Tuple[str, ...] = ()) -> Optional[Dict]:
+    """从文本中找出第一个包含所需字段的JSON对象，前后的说明文字不影响解析"""
+    pos = text.find('{')
+    while pos != -1:
+        try:
+            obj, end = _JSON_DECODER.raw_decode(text, pos)
+        except ValueError:
+            pos = text.find('{', pos + 1)
+            continue
+        if isinstance(obj, dict) and all(key in obj for key in required_keys):
+            return obj
+        # 完整解析出的对象不符合要求，跳过整个对象继续查找
+        pos = text.find('{', end)
+    return None
+
+
+def _is_module_available(module: str) -> bool:
+    """判断模块是否已安装（只查找，不执行模块代码）"""
+    try:
+        return importlib.util.find_spec(module) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def _load_json_bytes(raw: bytes):
+    """解析UTF-8 JSON字节串"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _is_srt_timestamp(value: str) -> bool:
+    """判断是否为 HH:MM:SS,mmm（或 HH:MM:SS.mmm）格式的时间戳"""
+    return (
+        len(value) == 12
+        and value[2] == ':' and value[5] == ':' and value[8] in ',.'
+        and (value[0:2] + value[3:5] + value[6:8] + value[9:12]).isdigit()
+    )
+
+
+def _parse_srt_time_line(line: str) -> Optional[Tuple[str, str]]:
+    """按固定格式解析时间轴行，返回统一为逗号毫秒分隔的(开始, 结束)，格式不符时返回None"""
+    arrow = line.find('-->')
+    if arrow < 0:
+        return None
+
+    start = line[:arrow].strip()[-12:]
+    end = line[arrow + 3:].strip()[:12]
+    if not (_is_srt_timestamp(start) and _is_srt_timestamp(end)):
+        return None
+
+    return start.replace('.', ','), end.replace('.', ',')
+
+
 class IntelligentTVClipper:
     """智能电视剧剪辑系统"""
 
@@ -32,6 +193,39 @@ class IntelligentTVClipper:
         # 加载AI配置
         self.ai_config = self.load_ai_config()
 
+        # 字幕编码缓存（文件路径 -> (编码, 解码错误处理方式)）
+        self._encoding_cache: Dict[str, Tuple[str, str]] = {}
+
+        # 视频文件索引（小写文件名 -> 路径），每轮批处理开始时重建
+        self._video_index: Optional[Dict[str, str]] = None
+
+        # 本进程内的分析结果（(字幕文件, 修改时间, 大小) -> 分析），重复运行时免读缓存JSON
+        self._analysis_memo: Dict[Tuple[str, int, int], Dict] = {}
+
+        # 字幕内容哈希索引（字幕文件 -> 大小、修改时间、哈希），持久化在缓存目录，
+        # 文件未变化时跨运行复用哈希，无需重新读取字幕
+        self._hash_index_path = os.path.join(self.cache_folder, '_mtime_index.json')
+        self._hash_index: Optional[Dict[str, Dict]] = None
+        self._hash_index_lock = threading.Lock()
+
+        # 多集并行时限制同时在途的AI请求数
+        self._ai_semaphore = threading.BoundedSemaphore(MAX_CONCURRENT_AI_CALLS)
+
+        # 多集、多片段并行时，全局同时运行的重新编码进程数按CPU核数的一半限制，
+        # 每个编码器按该上限平分CPU核数，避免编码器线程互相争抢
+        cpu_count = os.cpu_count() or 2
+        self._encode_slots = threading.BoundedSemaphore(max(1, cpu_count // 2))
+        self._encode_threads = cpu_count // max(1, cpu_count // 2)
+
+        # FFmpeg可用性检测结果（None表示尚未检测）
+        self._ffmpeg_available: Optional[bool] = None
+
+        # 重新编码使用的视频编码参数（None表示尚未检测硬件编码器）
+        self._video_encoder_args: Optional[List[str]] = None
+
+        # 流复制起点对应的关键帧时间（(视频文件, 起始秒数) -> 关键帧秒数）
+        self._keyframe_cache: Dict[Tuple[str, float], float] = {}
+
         print("🚀 智能AI电视剧剪辑系统")
         print(f"📁 字幕目录: {self.srt_folder}/")
         print(f"🎬 视频目录: {self.video_folder}/")
@@ -41,8 +235,8 @@ class IntelligentTVClipper:
         """加载AI配置"""
         try:
             if os.path.exists('.ai_config.json'):
-                with open('.ai_config.json', 'r', encoding='utf-8') as f:
-                    config = json.load(f)
+                with open('.ai_config.json', 'rb') as f:
+                    config = _load_json_bytes(f.read())
                     if config.get('enabled', False):
                         provider = config.get('provider', 'unknown')
                         print(f"🤖 AI分析已启用: {provider}")
@@ -105,56 +299,82 @@ class IntelligentTVClipper:
         """解析字幕文件"""
         print(f"📖 解析字幕: {os.path.basename(filepath)}")
 
-        # 尝试不同编码
-        content = None
-        for encoding in ['utf-8', 'gbk', 'utf-16']:
-            try:
-                with open(filepath, 'r', encoding=encoding, errors='ignore') as f:
-                    content = f.read()
-                    break
-            except:
-                continue
-
-        if not content:
+        try:
+            subtitles = list(self.iter_subtitles(filepath))
+        except OSError:
             print(f"❌ 无法读取文件: {filepath}")
             return []
 
-        # 解析字幕条目
-        subtitles = []
-        blocks = re.split(r'\n\s*\n', content.strip())
+        print(f"✅ 解析完成: {len(subtitles)} 条字幕")
+        return subtitles
 
-        for block in blocks:
-            lines = block.strip().split('\n')
-            if len(lines) >= 3:
-                try:
-                    index = int(lines[0]) if lines[0].isdigit() else len(subtitles) + 1
-
-                    # 匹配时间格式
-                    time_pattern = r'(\d{2}:\d{2}:\d{2}[,\.]\d{3})\s*-->\s*(\d{2}:\d{2}:\d{2}[,\.]\d{3})'
-                    time_match = re.search(time_pattern, lines[1])
-
-                    if time_match:
-                        start_time = time_match.group(1).replace('.', ',')
-                        end_time = time_match.group(2).replace('.', ',')
-                        text = '\n'.join(lines[2:]).strip()
-
-                        if text:
-                            subtitles.append({
-                                'index': index,
-                                'start': start_time,
-                                'end': end_time,
-                                'text': text
-                            })
-                except (ValueError, IndexError):
+    def iter_subtitles(self, filepath: str) -> Iterator[Dict]:
+        """逐行流式解析字幕文件，每解析完一个条目就产出，不在内存中保留整个文件内容"""
+        encoding, errors = self._detect_subtitle_encoding(filepath)
+        count = 0
+        block = []
+
+        with open(filepath, 'r', encoding=encoding, errors=errors) as f:
+            # 非空行累积为当前条目，遇到空行时解析该条目
+            for line in f:
+                if line.strip():
+                    block.append(line.rstrip('\n'))
                     continue
+                if block:
+                    subtitle = self._parse_subtitle_block(block, count + 1)
+                    block = []
+                    if subtitle:
+                        count += 1
+                        yield subtitle
+
+        if block:
+            subtitle = self._parse_subtitle_block(block, count + 1)
+            if subtitle:
+                yield subtitle
+
+    def _parse_subtitle_block(self, lines: List[str], default_index: int) -> Optional[Dict]:
+        """解析一个字幕条目（序号行、时间行、文本行），格式不符时返回None"""
+        if len(lines) < 3:
+            return None
 
-        print(f"✅ 解析完成: {len(subtitles)} 条字幕")
-        return subtitles
+        index_line = lines[0].strip()
+        try:
+            index = int(index_line) if index_line.isdigit() else default_index
+        except ValueError:
+            return None
+
+        times = _parse_srt_time_line(lines[1])
+        if times is None:
+            return None
+
+        # 绝大多数条目只有一行文本，直接取用，避免切片和拼接
+        if len(lines) == 3:
+            text = lines[2].strip()
+        else:
+            text = '\n'.join(lines[2:]).strip()
+        if not text:
+            return None
+
+        return {
+            'index': index,
+            'start': times[0],
+            'end': times[1],
+            'text': text
+        }
+
+    def _detect_subtitle_encoding(self, filepath: str) -> Tuple[str, str]:
+        """检测字幕编码，返回(编码, 解码错误处理方式)；同一文件重复处理时直接复用已检测的结果"""
+        detected = self._encoding_cache.get(filepath)
+        if detected is None:
+            detected = detect_subtitle_encoding(filepath)
+            self._encoding_cache[filepath] = detected
+        return detected
 
     def call_ai_api(self, prompt: str, system_prompt: str = "") -> Optional[str]:
         """统一AI API调用"""
         from api_config_helper import config_helper
-        return config_helper.call_ai_api(prompt, self.ai_config, system_prompt)
+        with self._ai_semaphore:
+            return config_helper.call_ai_api(prompt, self.ai_config, system_prompt)
 
     def _extract_episode_number(self, filename: str) -> str:
         """从文件名提取集数（使用srt名字作为集数）"""
@@ -170,48 +390,16 @@ class IntelligentTVClipper:
         full_context = self.build_complete_context(subtitles)
         episode_num = self._extract_episode_number(filename)
 
-        prompt = f"""你是资深电视剧剪辑师，需要分析{episode_num}内容，找出最适合制作短视频的精彩片段。
-
-【剧集字幕内容】
-{full_context}
-
-【分析要求】
-1. 找出3-5个最精彩的片段，每个片段时长2-3分钟
-2. 优先选择戏剧冲突强烈、情感张力大的场景
-3. 确保片段有完整的故事起承转合
-4. 每个片段都要有吸引观众的亮点
-
-【输出格式】
-请严格按照JSON格式输出：
-
-{{
-    "episode_analysis": {{
-        "episode_number": "{episode_num}",
-        "genre_type": "推测的剧情类型",
-        "main_theme": "本集核心主题"
-    }},
-    "highlight_segments": [
-        {{
-            "segment_id": 1,
-            "title": "吸引人的片段标题",
-            "start_time": "精确的开始时间（格式：00:XX:XX,XXX）",
-            "end_time": "精确的结束时间（格式：00:XX:XX,XXX）",
-            "duration_seconds": 片段时长秒数,
-            "plot_significance": "这个片段在剧情中的重要作用",
-            "professional_narration": "为这个片段写的专业解说词",
-            "highlight_tip": "一句话提示观众关注的精彩点",
-            "content_summary": "片段内容简要概括"
-        }}
-    ]
-}}"""
-
-        system_prompt = "你是专业的影视剪辑师和内容分析专家，擅长识别电视剧中的精彩片段。请严格按照JSON格式输出。"
+        prompt = EPISODE_ANALYSIS_PROMPT.format(episode_num=episode_num, full_context=full_context)
 
         try:
-            response = self.call_ai_api(prompt, system_prompt)
+            response = self.call_ai_api(prompt, AI_SYSTEM_PROMPT)
             if response:
                 parsed_result = self.parse_ai_response(response)
                 if parsed_result:
+                    # 集数以字幕文件名为准
+                    if isinstance(parsed_result['episode_analysis'], dict):
+                        parsed_result['episode_analysis']['episode_number'] = episode_num
                     print(f"✅ AI分析成功：{len(parsed_result.get('highlight_segments', []))} 个片段")
                     return parsed_result
         except Exception as e:
@@ -221,56 +409,84 @@ class IntelligentTVClipper:
 
     def build_complete_context(self, subtitles: List[Dict]) -> str:
         """构建完整上下文"""
+        # 单次遍历：每条字幕只格式化一次，每20条合并为一段，不再对字幕列表切片
         context_segments = []
-        for i in range(0, len(subtitles), 20):
-            segment = subtitles[i:i+20]
-            segment_text = ' '.join([f"[{sub['start']}] {sub['text']}" for sub in segment])
-            context_segments.append(segment_text)
+        buffer = []
+        for sub in subtitles:
+            buffer.append(f"[{sub['start']}] {sub['text']}")
+            if len(buffer) == 20:
+                context_segments.append(' '.join(buffer))
+                buffer.clear()
+        if buffer:
+            context_segments.append(' '.join(buffer))
 
         return '\n\n'.join(context_segments)
 
     def parse_ai_response(self, response: str) -> Optional[Dict]:
         """解析AI响应"""
-        try:
-            if "```json" in response:
-                start = response.find("```json") + 7
-                end = response.find("```", start)
-                json_text = response[start:end]
-            else:
-                start = response.find("{")
-                end = response.rfind("}") + 1
-                json_text = response[start:end]
-
-            result = json.loads(json_text)
+        required_keys = ('highlight_segments', 'episode_analysis')
 
-            if 'highlight_segments' in result and 'episode_analysis' in result:
+        # 优先解析代码块内容，再在整段响应中查找
+        fence = _JSON_FENCE_RE.search(response)
+        if fence:
+            result = _extract_json_object(fence.group(1), required_keys)
+            if result is not None:
                 return result
-        except Exception as e:
-            print(f"⚠️ JSON解析失败: {e}")
-        return None
+
+        result = _extract_json_object(response, required_keys)
+        if result is None:
+            print("⚠️ JSON解析失败: 未找到有效的分析结果")
+        return result
+
+    def _build_video_index(self) -> Dict[str, str]:
+        """扫描一次视频目录，建立小写文件名（不含扩展名）到路径的索引"""
+        candidates = []
+        try:
+            with os.scandir(self.video_folder) as entries:
+                for entry in entries:
+                    base, ext = os.path.splitext(entry.name)
+                    ext = ext.lower()
+                    if ext in VIDEO_EXTENSIONS and entry.is_file():
+                        candidates.append((VIDEO_EXTENSIONS.index(ext), entry.name, base.lower()))
+        except OSError:
+            pass
+
+        # 同名多个扩展名时按VIDEO_EXTENSIONS优先级保留
+        index = {}
+        for _, filename, key in sorted(candidates):
+            index.setdefault(key, os.path.join(self.video_folder, filename))
+
+        self._video_index = index
+        return index
 
     def find_matching_video(self, subtitle_filename: str) -> Optional[str]:
         """智能匹配视频文件"""
-        base_name = os.path.splitext(subtitle_filename)[0]
+        video_index = self._video_index
+        if video_index is None:
+            video_index = self._build_video_index()
+
+        base_name = os.path.splitext(subtitle_filename)[0].lower()
 
         # 精确匹配
-        video_extensions = ['.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv']
-        for ext in video_extensions:
-            video_path = os.path.join(self.video_folder, base_name + ext)
-            if os.path.exists(video_path):
-                return video_path
+        video_path = video_index.get(base_name)
+        if video_path:
+            return video_path
 
         # 模糊匹配
-        for filename in os.listdir(self.video_folder):
-            if any(filename.lower().endswith(ext) for ext in video_extensions):
-                if base_name.lower() in filename.lower():
-                    return os.path.join(self.video_folder, filename)
+        for key, video_path in video_index.items():
+            if base_name in key:
+                return video_path
 
         return None
 
     def time_to_seconds(self, time_str: str) -> float:
         """时间转换为秒"""
         try:
+            # 常见的标准格式 HH:MM:SS,mmm 直接按固定位置切片
+            if len(time_str) == 12 and time_str[2] == ':' and time_str[5] == ':' and time_str[8] in ',.':
+                return (int(time_str[0:2]) * 3600 + int(time_str[3:5]) * 60
+                        + int(time_str[6:8]) + int(time_str[9:12]) / 1000)
+
             time_str = time_str.replace('.', ',')
             h, m, s_ms = time_str.split(':')
             s, ms = s_ms.split(',')
@@ -279,52 +495,212 @@ class IntelligentTVClipper:
             return 0.0
 
     def check_ffmpeg(self) -> bool:
-        """检查FFmpeg是否可用"""
-        try:
-            result = subprocess.run(
-                ['ffmpeg', '-version'], 
-                capture_output=True, 
-                text=True
-            )
-            return result.returncode == 0
-        except:
-            return False
+        """检查FFmpeg是否可用（只检测一次，结果缓存）"""
+        if self._ffmpeg_available is None:
+            try:
+                result = subprocess.run(
+                    ['ffmpeg', '-version'],
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL
+                )
+                self._ffmpeg_available = result.returncode == 0
+            except:
+                self._ffmpeg_available = False
+        return self._ffmpeg_available
 
-    def create_video_clips(self, analysis: Dict, video_file: str, subtitle_filename: str) -> List[str]:
-        """创建视频片段"""
+    def create_video_clips(self, analysis: Dict, video_file: str, subtitle_filename: str,
+                           reencode: bool = False) -> List[str]:
+        """创建视频片段（reencode=True时强制重新编码以获得精确剪切点）"""
         created_clips = []
 
         if not self.check_ffmpeg():
             print("❌ 未找到FFmpeg，无法剪辑视频")
             return []
 
-        for segment in analysis.get('highlight_segments', []):
+        # AI按精彩程度排序片段，这里改为按开始时间顺序剪辑，使源视频读取保持单向前进
+        segments = sorted(
+            analysis.get('highlight_segments', []),
+            key=lambda seg: self.time_to_seconds(seg.get('start_time', ''))
+        )
+
+        pending = []
+        for segment in segments:
             segment_id = segment.get('segment_id', 1)
             title = segment.get('title', '精彩片段')
 
             # 生成安全的文件名
-            safe_title = re.sub(r'[^\w\u4e00-\u9fff\-_]', '_', title)
+            safe_title = _SAFE_TITLE_RE.sub('_', title)
             clip_filename = f"{safe_title}_seg{segment_id}.mp4"
             clip_path = os.path.join(self.output_folder, clip_filename)
 
-            # 检查是否已存在
-            if os.path.exists(clip_path) and os.path.getsize(clip_path) > 1024:
-                print(f"✅ 片段已存在: {clip_filename}")
+            # 检查是否已存在（一次stat同时判断存在和大小）
+            try:
+                if os.stat(clip_path).st_size > 1024:
+                    print(f"✅ 片段已存在: {clip_filename}")
+                    created_clips.append(clip_path)
+                    continue
+            except FileNotFoundError:
+                pass
+
+            # 同一视频、同一时间段已剪辑过（只是标题变了）时直接复用
+            cache_path = self._get_clip_cache_path(video_file, segment, reencode)
+            if cache_path and self._restore_cached_clip(cache_path, clip_path):
+                print(f"♻️ 复用已剪辑片段: {clip_filename}")
                 created_clips.append(clip_path)
+                self.create_narration_file(clip_path, segment)
                 continue
 
+            pending.append((segment, clip_path, cache_path))
+
+        # 多个片段时先用一次FFmpeg调用批量流复制，失败的片段再逐个处理
+        batched = set()
+        if not reencode and len(pending) > 1:
+            batched = self._create_clips_batch(video_file, [job[:2] for job in pending])
+
+        # 剩余片段相互独立，各自是一个FFmpeg进程，用线程并行剪辑
+        remaining = [(segment, clip_path) for segment, clip_path, _ in pending if clip_path not in batched]
+        max_workers = max(1, min(len(remaining), MAX_PARALLEL_CLIPS, (os.cpu_count() or 2) // 2))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            clipped = dict(zip(
+                (clip_path for _, clip_path in remaining),
+                executor.map(lambda job: self.create_single_clip(video_file, job[0], job[1], reencode=reencode,
+                                                                 threads=self._encode_threads), remaining)
+            ))
+
+        for segment, clip_path, cache_path in pending:
             # 剪辑视频
-            if self.create_single_clip(video_file, segment, clip_path):
+            if clip_path in batched or clipped.get(clip_path):
                 created_clips.append(clip_path)
+                if cache_path:
+                    self._store_clip_in_cache(clip_path, cache_path)
                 # 生成旁白文件
                 self.create_narration_file(clip_path, segment)
             else:
-                print(f"❌ 片段创建失败: {title}")
+                print(f"❌ 片段创建失败: {segment.get('title', '精彩片段')}")
 
         return created_clips
 
-    def create_single_clip(self, video_file: str, segment: Dict, output_path: str) -> bool:
-        """创建单个视频片段"""
+    def _get_clip_cache_path(self, video_file: str, segment: Dict, reencode: bool) -> Optional[str]:
+        """按源视频（路径、修改时间、大小）、剪辑时间段和剪辑方式生成片段缓存路径"""
+        try:
+            st = os.stat(video_file)
+        except OSError:
+            return None
+
+        start_seconds = self.time_to_seconds(segment.get('start_time', ''))
+        end_seconds = self.time_to_seconds(segment.get('end_time', ''))
+        mode = 'reencode' if reencode else 'copy'
+        key_source = f"{os.path.abspath(video_file)}:{st.st_mtime_ns}:{st.st_size}:{start_seconds}:{end_seconds}:{mode}"
+        key = hashlib.md5(key_source.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.output_folder, '.cache', f"{key}.mp4")
+
+    def _prune_clip_cache(self) -> int:
+        """删除已没有输出片段链接的缓存条目（硬链接数为1），返回删除的条目数"""
+        removed = 0
+        try:
+            with os.scandir(os.path.join(self.output_folder, '.cache')) as entries:
+                for entry in entries:
+                    try:
+                        # Windows下DirEntry.stat()的st_nlink恒为0，需用os.stat取得真实硬链接数
+                        if entry.is_file() and os.stat(entry.path).st_nlink <= 1:
+                            os.remove(entry.path)
+                            removed += 1
+                    except OSError:
+                        continue
+        except FileNotFoundError:
+            pass
+        return removed
+
+    def _restore_cached_clip(self, cache_path: str, clip_path: str) -> bool:
+        """把缓存片段硬链接到目标路径（不支持硬链接时复制），缓存不存在返回False"""
+        try:
+            if os.stat(cache_path).st_size <= 1024:
+                return False
+        except FileNotFoundError:
+            return False
+
+        try:
+            # 目标位置若有未完成的残留文件，先删除
+            try:
+                os.remove(clip_path)
+            except FileNotFoundError:
+                pass
+            os.link(cache_path, clip_path)
+        except OSError:
+            try:
+                shutil.copyfile(cache_path, clip_path)
+            except OSError:
+                return False
+        return True
+
+    def _store_clip_in_cache(self, clip_path: str, cache_path: str):
+        """把新剪辑的片段硬链接进缓存目录，不额外占用磁盘空间"""
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            try:
+                os.remove(cache_path)
+            except FileNotFoundError:
+                pass
+            os.link(clip_path, cache_path)
+        except OSError:
+            # 文件系统不支持硬链接时不做缓存
+            pass
+
+    def _create_clips_batch(self, video_file: str, jobs: List[Tuple[Dict, str]]) -> Set[str]:
+        """一次FFmpeg调用流复制多个片段，返回成功生成的片段路径集合"""
+        cmd = ['ffmpeg', '-hide_banner', '-loglevel', 'error']
+        outputs = []
+
+        # 每个片段对应一个带-ss/-t的输入，全部在同一个进程内完成
+        for segment, clip_path in jobs:
+            start_seconds = self.time_to_seconds(segment.get('start_time', ''))
+            duration = self.time_to_seconds(segment.get('end_time', '')) - start_seconds
+            if duration <= 0:
+                continue
+            copy_start, copy_duration = snap_to_keyframe(video_file, start_seconds, duration, self._keyframe_cache)
+            cmd += ['-ss', str(copy_start), '-t', str(copy_duration), '-i', video_file]
+            outputs.append((clip_path, copy_duration))
+
+        if len(outputs) < 2:
+            return set()
+
+        for input_index, (clip_path, _) in enumerate(outputs):
+            cmd += [
+                '-map', f'{input_index}:v:0',
+                '-map', f'{input_index}:a:0?',
+                '-c', 'copy',
+                '-avoid_negative_ts', 'make_zero',
+                '-movflags', '+faststart',
+                clip_path
+            ]
+        cmd.append('-y')
+
+        print(f"🎬 批量剪辑 {len(outputs)} 个片段")
+        try:
+            result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=600)
+        except (OSError, subprocess.SubprocessError) as e:
+            print(f"   ↪️ 批量剪辑异常，改为逐个处理: {e}")
+            return set()
+
+        if result.returncode != 0:
+            print(f"   ↪️ 批量剪辑失败，改为逐个处理")
+            return set()
+
+        succeeded = set()
+        for clip_path, duration in outputs:
+            try:
+                size = os.stat(clip_path).st_size
+            except FileNotFoundError:
+                continue
+            if clip_duration_matches(clip_path, duration):
+                print(f"   ✅ {os.path.basename(clip_path)}: {size / (1024*1024):.1f}MB")
+                succeeded.add(clip_path)
+
+        return succeeded
+
+    def create_single_clip(self, video_file: str, segment: Dict, output_path: str,
+                           reencode: bool = False, threads: int = 0) -> bool:
+        """创建单个视频片段（默认流复制，失败或时长偏差过大时重新编码；threads为0时由FFmpeg自动决定线程数）"""
         try:
             start_time = segment['start_time']
             end_time = segment['end_time']
@@ -340,34 +716,97 @@ class IntelligentTVClipper:
                 print(f"   ❌ 无效时间段")
                 return False
 
-            # FFmpeg命令
-            cmd = [
-                'ffmpeg',
-                '-i', video_file,
-                '-ss', str(start_seconds),
-                '-t', str(duration),
-                '-c:v', 'libx264',
-                '-c:a', 'aac',
-                '-preset', 'medium',
-                '-crf', '23',
-                output_path,
-                '-y'
-            ]
-
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
-
-            if result.returncode == 0 and os.path.exists(output_path):
+            if not reencode:
+                # 流复制：-ss放在-i之前按关键帧快速定位，不做解码和编码
+                copy_start, copy_duration = snap_to_keyframe(video_file, start_seconds, duration, self._keyframe_cache)
+                copy_cmd = [
+                    'ffmpeg',
+                    '-hide_banner',
+                    '-loglevel', 'error',
+                    '-ss', str(copy_start),
+                    '-i', video_file,
+                    '-t', str(copy_duration),
+                    '-c', 'copy',
+                    '-avoid_negative_ts', 'make_zero',
+                    '-movflags', '+faststart',
+                    output_path,
+                    '-y'
+                ]
+
+                success, _ = run_ffmpeg(copy_cmd, output_path)
+                if success and clip_duration_matches(output_path, copy_duration):
+                    file_size = os.path.getsize(output_path) / (1024*1024)
+                    print(f"   ✅ 成功(流复制): {file_size:.1f}MB")
+                    return True
+
+                print(f"   ↪️ 流复制不可用，改为重新编码")
+
+            # 重新编码：-ss放在-i之后，精确剪切
+            encoder_args = self._get_video_encoder_args()
+            cmd = self._build_encode_cmd(video_file, start_seconds, duration, encoder_args, output_path, threads)
+
+            with self._encode_slots:
+                success, error_msg = run_ffmpeg(cmd, output_path)
+                if not success and encoder_args is not LIBX264_ARGS:
+                    # 编码器已编译但没有可用硬件时会失败，之后统一改用软件编码
+                    print(f"   ↪️ 硬件编码失败，改用libx264")
+                    self._video_encoder_args = LIBX264_ARGS
+                    cmd = self._build_encode_cmd(video_file, start_seconds, duration, LIBX264_ARGS, output_path, threads)
+                    success, error_msg = run_ffmpeg(cmd, output_path)
+
+            if success:
                 file_size = os.path.getsize(output_path) / (1024*1024)
                 print(f"   ✅ 成功: {file_size:.1f}MB")
                 return True
             else:
-                print(f"   ❌ 失败")
+                print(f"   ❌ 失败: {error_msg}")
                 return False
 
         except Exception as e:
             print(f"   ❌ 剪辑异常: {e}")
             return False
 
+    def _build_encode_cmd(self, video_file: str, start_seconds: float, duration: float,
+                          encoder_args: List[str], output_path: str, threads: int = 0) -> List[str]:
+        """构建重新编码的FFmpeg命令"""
+        thread_args = ['-threads', str(threads)] if threads > 0 else []
+        return [
+            'ffmpeg',
+            '-hide_banner',
+            '-loglevel', 'error',
+            '-i', video_file,
+            '-ss', str(start_seconds),
+            '-t', str(duration),
+            *encoder_args,
+            *thread_args,
+            '-c:a', 'aac',
+            output_path,
+            '-y'
+        ]
+
+    def _get_video_encoder_args(self) -> List[str]:
+        """返回重新编码的视频编码参数：首次调用时检测硬件编码器，之后复用结果"""
+        if self._video_encoder_args is None:
+            self._video_encoder_args = LIBX264_ARGS
+            try:
+                result = subprocess.run(
+                    ['ffmpeg', '-hide_banner', '-encoders'],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL,
+                    timeout=30
+                )
+                encoders = result.stdout.decode('utf-8', 'replace')
+                for name, args in HW_H264_ENCODERS:
+                    if name == 'h264_vaapi' and not os.path.exists(VAAPI_DEVICE):
+                        continue
+                    if name in encoders:
+                        print(f"   ⚡ 使用硬件编码器: {name}")
+                        self._video_encoder_args = args
+                        break
+            except (OSError, subprocess.SubprocessError):
+                pass
+        return self._video_encoder_args
+
     def create_narration_file(self, video_path: str, segment: Dict):
         """创建旁白文件"""
         try:
@@ -403,41 +842,130 @@ class IntelligentTVClipper:
         except Exception as e:
             print(f"   ⚠️ 旁白生成失败: {e}")
 
-    def get_analysis_cache_path(self, subtitle_file: str) -> str:
-        """获取分析缓存文件路径"""
+    def _get_subtitle_hash(self, subtitle_file: str) -> str:
+        """计算字幕内容哈希，作为分析缓存的内容键（文件大小和修改时间未变时直接复用）"""
         subtitle_path = os.path.join(self.srt_folder, subtitle_file)
+        try:
+            st = os.stat(subtitle_path)
+        except OSError:
+            return hashlib.md5(subtitle_file.encode()).hexdigest()[:12]
+
+        with self._hash_index_lock:
+            entry = self._load_hash_index().get(subtitle_file)
+        if entry and entry.get('size') == st.st_size and entry.get('mtime_ns') == st.st_mtime_ns:
+            return entry['hash']
+
+        # 分块读取并累计哈希，不在内存中拼出整个文件文本；
+        # 读取方式与哈希算法不变，已有的分析缓存继续有效
+        digest = hashlib.md5()
         try:
             with open(subtitle_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-            content_hash = hashlib.md5(content.encode()).hexdigest()[:12]
-        except:
-            content_hash = hashlib.md5(subtitle_file.encode()).hexdigest()[:12]
+                for chunk in iter(lambda: f.read(ENCODING_PROBE_CHUNK), ''):
+                    digest.update(chunk.encode())
+        except OSError:
+            return hashlib.md5(subtitle_file.encode()).hexdigest()[:12]
+        content_hash = digest.hexdigest()[:12]
+
+        with self._hash_index_lock:
+            index = self._load_hash_index()
+            index[subtitle_file] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'hash': content_hash}
+            self._save_hash_index(index)
+        return content_hash
+
+    def _load_hash_index(self) -> Dict[str, Dict]:
+        """读取字幕哈希索引（首次调用时从磁盘加载），调用方需持有锁"""
+        if self._hash_index is None:
+            index = self._read_json_file(self._hash_index_path)
+            self._hash_index = index if isinstance(index, dict) else {}
+        return self._hash_index
+
+    def _save_hash_index(self, index: Dict[str, Dict]):
+        """先写临时文件再替换，写入失败只影响下次运行的速度"""
+        tmp_path = self._hash_index_path + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(_dump_json_bytes(index))
+            os.replace(tmp_path, self._hash_index_path)
+        except OSError as e:
+            print(f"⚠️ 哈希索引保存失败: {e}")
+
+    def get_analysis_cache_path(self, subtitle_file: str, content_hash: Optional[str] = None) -> str:
+        """获取分析缓存文件路径"""
+        if content_hash is None:
+            content_hash = self._get_subtitle_hash(subtitle_file)
 
         cache_filename = f"{os.path.splitext(subtitle_file)[0]}_{content_hash}.json"
         return os.path.join(self.cache_folder, cache_filename)
 
+    def _get_content_cache_path(self, content_hash: str) -> str:
+        """按内容寻址的分析缓存路径（字幕改名后仍可命中）"""
+        return os.path.join(self.cache_folder, 'by_hash', f"{content_hash}.json")
+
+    def _get_analysis_memo_key(self, subtitle_file: str) -> Optional[Tuple[str, int, int]]:
+        """用字幕文件的修改时间和大小作为内存缓存键"""
+        try:
+            st = os.stat(os.path.join(self.srt_folder, subtitle_file))
+        except OSError:
+            return None
+        return (subtitle_file, st.st_mtime_ns, st.st_size)
+
+    def _read_json_file(self, path: str) -> Optional[Dict]:
+        """读取JSON文件，不存在或损坏时返回None"""
+        try:
+            with open(path, 'rb') as f:
+                return _load_json_bytes(f.read())
+        except:
+            return None
+
     def load_analysis_cache(self, subtitle_file: str) -> Optional[Dict]:
         """加载分析缓存"""
-        cache_path = self.get_analysis_cache_path(subtitle_file)
-        if os.path.exists(cache_path):
-            try:
-                with open(cache_path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except:
-                pass
-        return None
+        memo_key = self._get_analysis_memo_key(subtitle_file)
+        if memo_key in self._analysis_memo:
+            return self._analysis_memo[memo_key]
+
+        content_hash = self._get_subtitle_hash(subtitle_file)
+        analysis = self._read_json_file(self.get_analysis_cache_path(subtitle_file, content_hash))
+
+        if analysis is None:
+            # 相同字幕内容换了文件名：复用内容缓存，集数改为当前文件名
+            analysis = self._read_json_file(self._get_content_cache_path(content_hash))
+            if analysis is not None and isinstance(analysis.get('episode_analysis'), dict):
+                analysis['episode_analysis']['episode_number'] = self._extract_episode_number(subtitle_file)
+
+        if analysis is not None and memo_key:
+            self._analysis_memo[memo_key] = analysis
+        return analysis
 
     def save_analysis_cache(self, subtitle_file: str, analysis: Dict):
         """保存分析缓存"""
-        cache_path = self.get_analysis_cache_path(subtitle_file)
+        memo_key = self._get_analysis_memo_key(subtitle_file)
+        if memo_key:
+            self._analysis_memo[memo_key] = analysis
+
+        content_hash = self._get_subtitle_hash(subtitle_file)
+        cache_paths = [
+            self.get_analysis_cache_path(subtitle_file, content_hash),
+            self._get_content_cache_path(content_hash)
+        ]
         try:
-            with open(cache_path, 'w', encoding='utf-8') as f:
-                json.dump(analysis, f, ensure_ascii=False, indent=2)
+            # 只序列化一次，两个缓存位置写入同一份字节
+            payload = _dump_json_bytes(analysis)
+            os.makedirs(os.path.dirname(cache_paths[1]), exist_ok=True)
+            for cache_path in cache_paths:
+                with open(cache_path, 'wb') as f:
+                    f.write(payload)
         except Exception as e:
             print(f"⚠️ 缓存保存失败: {e}")
 
-    def process_single_episode(self, subtitle_file: str) -> Optional[bool]:
+    def process_single_episode(self, subtitle_file: str) -> bool:
         """处理单集完整流程"""
+        analysis = self.get_episode_analysis(subtitle_file)
+        if analysis is None:
+            return False
+        return self.clip_episode(subtitle_file, analysis)
+
+    def get_episode_analysis(self, subtitle_file: str) -> Optional[Dict]:
+        """读取缓存或用AI分析单集，无法得到分析结果时返回None"""
         print(f"\n📺 处理: {subtitle_file}")
 
         # 1. 检查分析缓存
@@ -452,14 +980,14 @@ class IntelligentTVClipper:
 
             if not subtitles:
                 print(f"❌ 字幕解析失败")
-                return False
+                return None
 
             # 3. AI分析
             if self.ai_config.get('enabled'):
                 analysis = self.analyze_episode_with_ai(subtitles, subtitle_file)
                 if not analysis:
                     print(f"❌ AI分析失败，跳过此集")
-                    return False
+                    return None
 
                 # 保存到缓存
                 self.save_analysis_cache(subtitle_file, analysis)
@@ -467,6 +995,10 @@ class IntelligentTVClipper:
                 print(f"⚠️ AI未启用，跳过 {subtitle_file}")
                 return None
 
+        return analysis
+
+    def clip_episode(self, subtitle_file: str, analysis: Dict) -> bool:
+        """按分析结果剪辑单集，至少生成一个片段时返回True"""
         # 4. 找到视频文件
         video_file = self.find_matching_video(subtitle_file)
         if not video_file:
@@ -488,46 +1020,80 @@ class IntelligentTVClipper:
         print("\n🚀 开始智能剪辑处理")
         print("=" * 50)
 
-        # 检查字幕文件
-        subtitle_files = [f for f in os.listdir(self.srt_folder) 
-                         if f.endswith(('.srt', '.txt')) and not f.startswith('.')]
+        # 检查字幕文件（已按字符串排序，srt名字顺序就是电影顺序）
+        subtitle_files = self._scan_folder(self.srt_folder, SUBTITLE_EXTENSIONS)
 
         if not subtitle_files:
             print(f"❌ {self.srt_folder}/ 目录中未找到字幕文件")
             return
 
-        # 按字符串排序（srt名字顺序就是电影顺序）
-        subtitle_files.sort()
-
         print(f"📝 找到 {len(subtitle_files)} 个字幕文件")
 
+        # 视频目录只扫描一次，供各集匹配复用
+        self._build_video_index()
+
         # 处理每一集
         total_success = 0
         total_clips = 0
 
-        for subtitle_file in subtitle_files:
-            try:
-                success = self.process_single_episode(subtitle_file)
-                if success:
-                    total_success += 1
+        # AI分析主要在等待网络响应，按同时进行的AI请求上限并发；
+        # 剪辑耗时在ffmpeg子进程上，并发数按CPU核数控制。
+        # 每集分析完成后立即提交剪辑，编码与其余集数的AI请求重叠进行
+        ai_workers = max(1, min(len(subtitle_files), MAX_CONCURRENT_AI_CALLS))
+        clip_workers = max(1, min(len(subtitle_files), MAX_EPISODE_WORKERS, os.cpu_count() or 1))
+        clip_futures = {}
+        with ThreadPoolExecutor(max_workers=ai_workers) as ai_executor, \
+                ThreadPoolExecutor(max_workers=clip_workers) as clip_executor:
+            futures = {ai_executor.submit(self.get_episode_analysis, f): f for f in subtitle_files}
+            for future in as_completed(futures):
+                subtitle_file = futures[future]
+                try:
+                    analysis = future.result()
+                    if analysis is not None:
+                        clip_futures[clip_executor.submit(self.clip_episode, subtitle_file, analysis)] = subtitle_file
+                except Exception as e:
+                    print(f"❌ 分析 {subtitle_file} 出错: {e}")
+
+            for future in as_completed(clip_futures):
+                subtitle_file = clip_futures[future]
+                try:
+                    if future.result():
+                        total_success += 1
 
-            except Exception as e:
-                print(f"❌ 处理 {subtitle_file} 出错: {e}")
+                except Exception as e:
+                    print(f"❌ 处理 {subtitle_file} 出错: {e}")
 
         # 统计片段数
-        episode_clips = [f for f in os.listdir(self.output_folder) if f.endswith('.mp4')]
-        total_clips = len(episode_clips)
+        total_clips = len(self._scan_folder(self.output_folder, ('.mp4',)))
+
+        # 对应片段已被删除或改名覆盖的缓存条目不再有用，清理掉以免缓存目录无限增长
+        pruned = self._prune_clip_cache()
+        if pruned:
+            print(f"🧹 清理片段缓存: {pruned} 个")
 
         # 最终报告
         print(f"\n📊 处理完成:")
         print(f"✅ 成功处理: {total_success}/{len(subtitle_files)} 集")
         print(f"🎬 生成片段: {total_clips} 个")
 
+    def _scan_folder(self, folder: str, extensions: Tuple[str, ...]) -> List[str]:
+        """单次扫描目录，返回指定扩展名的文件名（已排序，忽略隐藏文件）"""
+        try:
+            with os.scandir(folder) as entries:
+                return sorted(
+                    entry.name for entry in entries
+                    if not entry.name.startswith('.')
+                    and os.path.splitext(entry.name)[1].lower() in extensions
+                    and entry.is_file()
+                )
+        except OSError:
+            return []
+
     def show_file_status(self):
         """显示文件状态"""
-        srt_files = [f for f in os.listdir(self.srt_folder) if f.endswith(('.srt', '.txt'))]
-        video_files = [f for f in os.listdir(self.video_folder) if f.endswith(('.mp4', '.mkv', '.avi'))]
-        output_files = [f for f in os.listdir(self.output_folder) if f.endswith('.mp4')]
+        srt_files = self._scan_folder(self.srt_folder, SUBTITLE_EXTENSIONS)
+        video_files = self._scan_folder(self.video_folder, VIDEO_EXTENSIONS)
+        output_files = self._scan_folder(self.output_folder, ('.mp4',))
 
         print(f"\n📊 文件状态:")
         print(f"📝 字幕文件: {len(srt_files)} 个")
@@ -550,9 +1116,9 @@ class IntelligentTVClipper:
                 print(f"AI状态: ❌ 未配置")
 
             # 检查文件状态
-            srt_count = len([f for f in os.listdir(self.srt_folder) if f.endswith(('.srt', '.txt'))])
-            video_count = len([f for f in os.listdir(self.video_folder) if f.endswith(('.mp4', '.mkv', '.avi'))])
-            clips_count = len([f for f in os.listdir(self.output_folder) if f.endswith('.mp4')])
+            srt_count = len(self._scan_folder(self.srt_folder, SUBTITLE_EXTENSIONS))
+            video_count = len(self._scan_folder(self.video_folder, VIDEO_EXTENSIONS))
+            clips_count = len(self._scan_folder(self.output_folder, ('.mp4',)))
 
             print(f"文件状态: 📝{srt_count}个字幕 🎬{video_count}个视频 📤{clips_count}个片段")
 
@@ -595,16 +1161,23 @@ class IntelligentTVClipper:
 
 def main():
     """主函数"""
-    # 安装必要依赖
+    # 安装必要依赖：只查找模块位置而不导入，已安装的包不再调用pip
     print("🔧 检查依赖...")
-    try:
-        subprocess.run([sys.executable, '-m', 'pip', 'install', 'openai'], check=False, capture_output=True)
-        subprocess.run([sys.executable, '-m', 'pip', 'install', 'google-generativeai'], check=False, capture_output=True)
-    except:
-        pass
+    for package, module in REQUIRED_PACKAGES.items():
+        if _is_module_available(module):
+            continue
+        try:
+            subprocess.run([sys.executable, '-m', 'pip', 'install', package], check=False, capture_output=True)
+        except:
+            pass
 
     clipper = IntelligentTVClipper()
-    clipper.show_main_menu()
+    try:
+        clipper.show_main_menu()
+    finally:
+        # 释放复用的AI客户端连接
+        from api_config_helper import config_helper
+        config_helper.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
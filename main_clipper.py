@@ -9,9 +9,38 @@
 import os
 import re
 import json
+import hashlib
 import subprocess
-from typing import List, Dict, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Tuple
 from api_config_helper import config_helper
+from utils import clip_duration_matches, run_ffmpeg, snap_to_keyframe
+
+# 并行处理的集数上限（每集主要在等待AI响应和FFmpeg子进程，线程即可并行）
+MAX_EPISODE_WORKERS = 4
+
+# 单集内同时剪辑的片段数上限
+MAX_PARALLEL_CLIPS = 2
+
+# AI分析结果缓存目录（按提示词内容的SHA256命名，字幕未变化时重跑不再调用API）
+ANALYSIS_CACHE_DIR = os.path.join('cache', 'ai_analysis')
+
+# 常见字幕错误（繁体/异体字）修正表
+SUBTITLE_CORRECTIONS = {
+    '防衛': '防卫', '正當': '正当', '証據': '证据', '檢察官': '检察官',
+    '發現': '发现', '設計': '设计', '開始': '开始', '結束': '结束',
+    '聽證會': '听证会', '辯護': '辩护', '審判': '审判', '調查': '调查'
+}
+
+# 预编译的正则表达式
+_BLOCK_SPLIT_RE = re.compile(r'\n\s*\n')
+_TIME_LINE_RE = re.compile(r'(\d{2}:\d{2}:\d{2},\d{3}) --> (\d{2}:\d{2}:\d{2},\d{3})')
+_EPISODE_RE = re.compile(r'[Ee](\d+)')
+_TIME_RANGE_RE = re.compile(r'(\d+)-(\d+)分钟')
+_SAFE_TITLE_RE = re.compile(r'[^\w\u4e00-\u9fff]')
+# 所有待修正词组成一个交替模式，一次扫描完成全部替换
+_CORRECTIONS_RE = re.compile('|'.join(map(re.escape, SUBTITLE_CORRECTIONS)))
 
 class UnifiedVideoClipper:
     def __init__(self):
@@ -21,6 +50,20 @@ class UnifiedVideoClipper:
         # 确保必要目录存在
         for dir_name in ['srt', 'videos', 'output_clips']:
             os.makedirs(dir_name, exist_ok=True)
+        
+        # 视频目录索引（小写文件名 -> 路径，集数 -> 路径），每轮处理开始时重建
+        self._video_index: Optional[Dict[str, str]] = None
+        self._video_episode_index: Dict[str, str] = {}
+        
+        # 流复制起点对应的关键帧时间（(视频文件, 起始秒数) -> 关键帧秒数）
+        self._keyframe_cache: Dict[Tuple[str, float], float] = {}
+        
+        # 多集、多片段并行时，全局同时运行的FFmpeg进程数按CPU核数的一半限制
+        self._ffmpeg_slots = threading.BoundedSemaphore(max(1, (os.cpu_count() or 2) // 2))
+        
+        # 并行处理时各集（及各片段）的日志先写入当前线程的缓冲区，完成后加锁整体输出
+        self._log_state = threading.local()
+        self._print_lock = threading.Lock()
 
     def process_all_episodes(self) -> Dict:
         """处理所有剧集"""
@@ -35,15 +78,53 @@ class UnifiedVideoClipper:
         
         print(f"📺 找到 {len(srt_files)} 集")
         
-        results = []
+        # 视频目录只扫描一次，供各集匹配复用
+        self._build_video_index()
         
-        for srt_file in srt_files:
-            print(f"\n处理: {srt_file}")
-            
+        # 各集相互独立，并行处理；结果按字幕文件顺序汇总
+        max_workers = max(1, min(len(srt_files), MAX_EPISODE_WORKERS))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            episode_results = list(executor.map(self._process_episode, srt_files))
+        
+        results = [result for result in episode_results if result is not None]
+        
+        self.generate_summary_report(results)
+        return results
+
+    def _log(self, message: str):
+        """输出日志：当前线程有日志缓冲区时先缓存，否则加锁直接输出"""
+        buffer = getattr(self._log_state, 'buffer', None)
+        if buffer is None:
+            with self._print_lock:
+                print(message)
+        else:
+            buffer.append(message)
+
+    def _flush_log(self, buffer: List[str]):
+        """加锁整体输出一段缓存的日志，避免与其他集的日志交错"""
+        if buffer:
+            with self._print_lock:
+                print('\n'.join(buffer))
+
+    def _process_episode(self, srt_file: str) -> Optional[Dict]:
+        """处理单集：解析、分析、剪辑，字幕无效时返回None；本集日志在处理完成后整体输出"""
+        self._log_state.buffer = []
+        try:
+            return self._process_episode_logged(srt_file)
+        finally:
+            buffer = self._log_state.buffer
+            self._log_state.buffer = None
+            self._flush_log(buffer)
+
+    def _process_episode_logged(self, srt_file: str) -> Optional[Dict]:
+        """处理单集的具体步骤"""
+        self._log(f"\n处理: {srt_file}")
+        
+        try:
             # 解析字幕
             subtitles = self.parse_srt(srt_file)
             if not subtitles:
-                continue
+                return None
             
             # AI分析（一次性分析整集）
             analysis = self.analyze_episode(subtitles, srt_file)
@@ -53,15 +134,15 @@ class UnifiedVideoClipper:
             
             # 创建视频片段
             created_clips = self.create_clips(srt_file, highlights)
-            
-            results.append({
-                'episode': srt_file,
-                'clips_created': len(created_clips),
-                'clips': created_clips
-            })
+        except Exception as e:
+            self._log(f"  ❌ 处理 {srt_file} 出错: {e}")
+            return None
         
-        self.generate_summary_report(results)
-        return results
+        return {
+            'episode': srt_file,
+            'clips_created': len(created_clips),
+            'clips': created_clips
+        }
 
     def get_srt_files(self) -> List[str]:
         """获取字幕文件列表"""
@@ -74,60 +155,61 @@ class UnifiedVideoClipper:
         return files
 
     def parse_srt(self, srt_file: str) -> List[Dict]:
-        """解析SRT字幕"""
+        """解析SRT字幕（逐行流式读取，每遇到空行解析一个条目）"""
         srt_path = os.path.join('srt', srt_file)
         
         try:
-            with open(srt_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-            
-            # 修正常见错误
-            content = self.fix_subtitle_errors(content)
-            
             subtitles = []
-            blocks = re.split(r'\n\s*\n', content.strip())
+            block = []
             
-            for block in blocks:
-                lines = block.strip().split('\n')
-                if len(lines) >= 3:
-                    try:
-                        index = int(lines[0])
-                        time_match = re.match(r'(\d{2}:\d{2}:\d{2},\d{3}) --> (\d{2}:\d{2}:\d{2},\d{3})', lines[1])
-                        if time_match:
-                            start_time = time_match.group(1)
-                            end_time = time_match.group(2)
-                            text = ' '.join(lines[2:]).strip()
-                            
-                            subtitles.append({
-                                'index': index,
-                                'start': start_time,
-                                'end': end_time,
-                                'text': text,
-                                'start_seconds': self.time_to_seconds(start_time),
-                                'end_seconds': self.time_to_seconds(end_time)
-                            })
-                    except (ValueError, IndexError):
+            with open(srt_path, 'r', encoding='utf-8', errors='ignore') as f:
+                for line in f:
+                    if line.strip():
+                        block.append(line.rstrip('\n'))
                         continue
+                    if block:
+                        self._append_srt_block(block, subtitles)
+                        block = []
             
-            print(f"  解析完成: {len(subtitles)} 条字幕")
+            if block:
+                self._append_srt_block(block, subtitles)
+            
+            self._log(f"  解析完成: {len(subtitles)} 条字幕")
             return subtitles
             
         except Exception as e:
-            print(f"  解析失败: {e}")
+            self._log(f"  解析失败: {e}")
             return []
 
-    def fix_subtitle_errors(self, content: str) -> str:
-        """修正常见字幕错误"""
-        corrections = {
-            '防衛': '防卫', '正當': '正当', '証據': '证据', '檢察官': '检察官',
-            '發現': '发现', '設計': '设计', '開始': '开始', '結束': '结束',
-            '聽證會': '听证会', '辯護': '辩护', '審判': '审判', '調查': '调查'
-        }
-        
-        for old, new in corrections.items():
-            content = content.replace(old, new)
+    def _append_srt_block(self, lines: List[str], subtitles: List[Dict]):
+        """解析一个字幕条目（序号行、时间行、文本行），格式有效时追加到列表"""
+        if len(lines) < 3:
+            return
         
-        return content
+        try:
+            index = int(lines[0])
+        except ValueError:
+            return
+        
+        time_match = _TIME_LINE_RE.match(lines[1])
+        if time_match:
+            start_time = time_match.group(1)
+            end_time = time_match.group(2)
+            # 修正常见错误：只处理文本部分，序号和时间行不会包含需要修正的字
+            text = self.fix_subtitle_errors(' '.join(lines[2:]).strip())
+            
+            subtitles.append({
+                'index': index,
+                'start': start_time,
+                'end': end_time,
+                'text': text,
+                'start_seconds': self.time_to_seconds(start_time),
+                'end_seconds': self.time_to_seconds(end_time)
+            })
+
+    def fix_subtitle_errors(self, content: str) -> str:
+        """修正常见字幕错误（单次扫描替换全部错误词）"""
+        return _CORRECTIONS_RE.sub(lambda m: SUBTITLE_CORRECTIONS[m.group(0)], content)
 
     def analyze_episode(self, subtitles: List[Dict], episode_file: str) -> Dict:
         """AI分析整集内容"""
@@ -138,7 +220,7 @@ class UnifiedVideoClipper:
         full_text = self.build_episode_text(subtitles)
         
         # 提取集数
-        episode_match = re.search(r'[Ee](\d+)', episode_file)
+        episode_match = _EPISODE_RE.search(episode_file)
         episode_num = episode_match.group(1) if episode_match else "1"
         
         prompt = f"""分析第{episode_num}集电视剧内容，识别3-5个最精彩的片段用于制作短视频。
@@ -166,24 +248,60 @@ class UnifiedVideoClipper:
     ]
 }}"""
 
+        # 提示词包含本集字幕内容，连同模型名一起作为缓存键
+        cache_path = self._get_analysis_cache_path(prompt)
+        cached = self._load_cached_analysis(cache_path)
+        if cached is not None:
+            self._log(f"  💾 使用缓存分析")
+            return cached
+
         try:
-            print(f"  🤖 调用AI分析...")
+            self._log(f"  🤖 调用AI分析...")
             response = config_helper.call_ai_api(prompt, self.config)
             if response:
-                print(f"  ✅ AI分析完成")
-                return self.parse_ai_response(response)
+                self._log(f"  ✅ AI分析完成")
+                analysis = self.parse_ai_response(response)
+                if analysis.get('highlights'):
+                    self._save_cached_analysis(cache_path, analysis)
+                return analysis
             else:
-                print(f"  ⚠️ AI分析返回空结果，使用备用分析")
+                self._log(f"  ⚠️ AI分析返回空结果，使用备用分析")
         except Exception as e:
             error_msg = str(e)
             if "10054" in error_msg or "远程主机" in error_msg:
-                print(f"  🔌 网络连接中断 (Error 10054)")
-                print(f"  💡 建议: 检查网络连接或更换API服务商")
+                self._log(f"  🔌 网络连接中断 (Error 10054)")
+                self._log(f"  💡 建议: 检查网络连接或更换API服务商")
             else:
-                print(f"  ❌ AI分析失败: {e}")
+                self._log(f"  ❌ AI分析失败: {e}")
         
         return self.fallback_analysis(episode_file)
 
+    def _get_analysis_cache_path(self, prompt: str) -> str:
+        """根据模型和提示词内容生成分析缓存路径"""
+        key_source = f"{self.config.get('model', '')}\n{prompt}"
+        key = hashlib.sha256(key_source.encode('utf-8')).hexdigest()
+        return os.path.join(ANALYSIS_CACHE_DIR, f"{key}.json")
+
+    def _load_cached_analysis(self, cache_path: str) -> Optional[Dict]:
+        """读取分析缓存，不存在或损坏时返回None"""
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                analysis = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return analysis if isinstance(analysis, dict) else None
+
+    def _save_cached_analysis(self, cache_path: str, analysis: Dict):
+        """先写临时文件再替换，中断时不会留下不完整的缓存"""
+        tmp_path = cache_path + '.tmp'
+        try:
+            os.makedirs(ANALYSIS_CACHE_DIR, exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(analysis, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            self._log(f"  ⚠️ 分析缓存保存失败: {e}")
+
     def build_episode_text(self, subtitles: List[Dict]) -> str:
         """构建完整剧情文本"""
         # 每600秒（10分钟）分一段
@@ -219,12 +337,12 @@ class UnifiedVideoClipper:
             
             return json.loads(json_text)
         except Exception as e:
-            print(f"  解析AI响应失败: {e}")
+            self._log(f"  解析AI响应失败: {e}")
             return {"highlights": []}
 
     def fallback_analysis(self, episode_file: str) -> Dict:
         """备用分析方法"""
-        episode_match = re.search(r'[Ee](\d+)', episode_file)
+        episode_match = _EPISODE_RE.search(episode_file)
         episode_num = episode_match.group(1) if episode_match else "1"
         
         return {
@@ -248,7 +366,7 @@ class UnifiedVideoClipper:
         for highlight in highlights:
             # 解析时间范围
             time_range = highlight.get('time_range', '')
-            time_match = re.search(r'(\d+)-(\d+)分钟', time_range)
+            time_match = _TIME_RANGE_RE.search(time_range)
             
             if time_match:
                 start_min = int(time_match.group(1))
@@ -306,13 +424,22 @@ class UnifiedVideoClipper:
         """创建视频片段"""
         video_file = self.find_video_file(episode_file)
         if not video_file:
-            print(f"  未找到视频文件: {episode_file}")
+            self._log(f"  未找到视频文件: {episode_file}")
             return []
         
         created_clips = []
         
-        for i, highlight in enumerate(highlights, 1):
-            clip_file = self.create_single_clip(video_file, highlight, episode_file, i)
+        # 各片段是独立的FFmpeg进程，用线程并行剪辑，结果和日志都保持原顺序
+        max_workers = max(1, min(len(highlights), MAX_PARALLEL_CLIPS))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            clip_results = list(executor.map(
+                lambda job: self._create_single_clip_logged(video_file, job[1], episode_file, job[0]),
+                enumerate(highlights, 1)
+            ))
+        
+        for highlight, (clip_file, clip_log) in zip(highlights, clip_results):
+            for message in clip_log:
+                self._log(message)
             if clip_file:
                 created_clips.append(clip_file)
                 # 生成说明文件
@@ -320,31 +447,57 @@ class UnifiedVideoClipper:
         
         return created_clips
 
+    def _create_single_clip_logged(self, video_file: str, highlight: Dict,
+                                   episode_file: str, clip_num: int) -> Tuple[Optional[str], List[str]]:
+        """在剪辑线程中创建单个片段，日志写入该片段自己的缓冲区，返回(片段路径, 日志)"""
+        self._log_state.buffer = []
+        try:
+            return self.create_single_clip(video_file, highlight, episode_file, clip_num), self._log_state.buffer
+        finally:
+            self._log_state.buffer = None
+
+    def _build_video_index(self) -> Dict[str, str]:
+        """扫描一次视频目录，建立文件名索引和集数索引"""
+        videos_dir = 'videos'
+        video_extensions = ('.mp4', '.mkv', '.avi', '.mov', '.wmv')
+        index = {}
+        episode_index = {}
+        
+        if os.path.isdir(videos_dir):
+            for file in os.listdir(videos_dir):
+                if not file.lower().endswith(video_extensions):
+                    continue
+                video_path = os.path.join(videos_dir, file)
+                index.setdefault(file.lower(), video_path)
+                
+                # 同一集有多个视频时保留目录中的第一个
+                file_episode = _EPISODE_RE.search(file)
+                if file_episode:
+                    episode_index.setdefault(file_episode.group(1), video_path)
+        
+        self._video_index = index
+        self._video_episode_index = episode_index
+        return index
+
     def find_video_file(self, srt_file: str) -> Optional[str]:
         """查找对应的视频文件"""
         base_name = os.path.splitext(srt_file)[0]
         video_extensions = ['.mp4', '.mkv', '.avi', '.mov', '.wmv']
         
-        videos_dir = 'videos'
-        if not os.path.exists(videos_dir):
-            return None
+        video_index = self._video_index
+        if video_index is None:
+            video_index = self._build_video_index()
         
         # 精确匹配
         for ext in video_extensions:
-            video_path = os.path.join(videos_dir, base_name + ext)
-            if os.path.exists(video_path):
+            video_path = video_index.get((base_name + ext).lower())
+            if video_path:
                 return video_path
         
         # 集数匹配
-        episode_match = re.search(r'[Ee](\d+)', base_name)
+        episode_match = _EPISODE_RE.search(base_name)
         if episode_match:
-            episode_num = episode_match.group(1)
-            
-            for file in os.listdir(videos_dir):
-                if any(file.lower().endswith(ext) for ext in video_extensions):
-                    file_episode = re.search(r'[Ee](\d+)', file)
-                    if file_episode and file_episode.group(1) == episode_num:
-                        return os.path.join(videos_dir, file)
+            return self._video_episode_index.get(episode_match.group(1))
         
         return None
 
@@ -366,25 +519,48 @@ class UnifiedVideoClipper:
             
             # 检查时长
             if duration < 30:  # 太短
-                print(f"    片段过短，跳过: {duration:.1f}秒")
+                self._log(f"    片段过短，跳过: {duration:.1f}秒")
                 return None
             
             if duration > 300:  # 超过5分钟，截取到5分钟
                 duration = 300
             
             # 生成文件名
-            episode_match = re.search(r'[Ee](\d+)', episode_file)
+            episode_match = _EPISODE_RE.search(episode_file)
             ep_num = episode_match.group(1) if episode_match else "1"
             
-            safe_title = re.sub(r'[^\w\u4e00-\u9fff]', '_', highlight['title'])
+            safe_title = _SAFE_TITLE_RE.sub('_', highlight['title'])
             output_name = f"E{ep_num}_{clip_num:02d}_{safe_title}.mp4"
             output_path = os.path.join('output_clips', output_name)
             
-            print(f"    剪辑: {highlight['title']} ({duration:.1f}秒)")
+            self._log(f"    剪辑: {highlight['title']} ({duration:.1f}秒)")
             
-            # FFmpeg命令
+            # 先流复制：-ss放在-i之前按关键帧快速定位，不做解码和编码
+            copy_start, copy_duration = snap_to_keyframe(video_file, max(0, start_seconds), duration, self._keyframe_cache)
+            copy_cmd = [
+                'ffmpeg',
+                '-hide_banner',
+                '-loglevel', 'error',
+                '-ss', str(copy_start),
+                '-i', video_file,
+                '-t', str(copy_duration),
+                '-c', 'copy',
+                '-avoid_negative_ts', 'make_zero',
+                output_path,
+                '-y'
+            ]
+            
+            success, _ = self._run_ffmpeg(copy_cmd, output_path)
+            if success and clip_duration_matches(output_path, copy_duration):
+                size_mb = os.path.getsize(output_path) / (1024 * 1024)
+                self._log(f"      ✅ 成功(流复制): {size_mb:.1f}MB")
+                return output_path
+            
+            # 流复制失败或时长偏差过大时重新编码
             cmd = [
                 'ffmpeg',
+                '-hide_banner',
+                '-loglevel', 'error',
                 '-i', video_file,
                 '-ss', str(max(0, start_seconds)),
                 '-t', str(duration),
@@ -395,20 +571,25 @@ class UnifiedVideoClipper:
                 '-y'
             ]
             
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+            success, error_msg = self._run_ffmpeg(cmd, output_path)
             
-            if result.returncode == 0 and os.path.exists(output_path):
+            if success:
                 size_mb = os.path.getsize(output_path) / (1024 * 1024)
-                print(f"      ✅ 成功: {size_mb:.1f}MB")
+                self._log(f"      ✅ 成功: {size_mb:.1f}MB")
                 return output_path
             else:
-                print(f"      ❌ 失败: {result.stderr[:100] if result.stderr else '未知错误'}")
+                self._log(f"      ❌ 失败: {error_msg}")
                 return None
                 
         except Exception as e:
-            print(f"      ❌ 剪辑出错: {e}")
+            self._log(f"      ❌ 剪辑出错: {e}")
             return None
 
+    def _run_ffmpeg(self, cmd: List[str], output_path: str) -> Tuple[bool, str]:
+        """占用全局FFmpeg并发名额运行FFmpeg命令，返回(是否成功, 错误信息)"""
+        with self._ffmpeg_slots:
+            return run_ffmpeg(cmd, output_path, max_error_chars=100)
+
     def create_clip_description(self, clip_file: str, highlight: Dict):
         """创建片段说明文件"""
         desc_file = clip_file.replace('.mp4', '_说明.txt')
@@ -442,7 +623,7 @@ class UnifiedVideoClipper:
             with open(desc_file, 'w', encoding='utf-8') as f:
                 f.write(content)
         except Exception as e:
-            print(f"      创建说明文件失败: {e}")
+            self._log(f"      创建说明文件失败: {e}")
 
     def generate_summary_report(self, results: List[Dict]):
         """生成总结报告"""
@@ -484,6 +665,11 @@ class UnifiedVideoClipper:
     def time_to_seconds(self, time_str: str) -> float:
         """时间转秒数"""
         try:
+            # 标准定长格式 HH:MM:SS,mmm 直接按固定位置切片
+            if len(time_str) == 12 and time_str[2] == ':' and time_str[5] == ':' and time_str[8] == ',':
+                return (int(time_str[0:2]) * 3600 + int(time_str[3:5]) * 60
+                        + int(time_str[6:8]) + int(time_str[9:12]) / 1000)
+            
             h, m, s_ms = time_str.split(':')
             s, ms = s_ms.split(',')
             return int(h) * 3600 + int(m) * 60 + int(s) + int(ms) / 1000
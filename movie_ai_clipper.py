@@ -232,7 +232,7 @@ class MovieAIClipper:
                     temp_analysis = json.load(f)
                     if temp_analysis.get('status') == 'completed':
                         # 将临时文件转为正式缓存
-                        os.rename(temp_cache_path, cache_path)
+                        os.replace(temp_cache_path, cache_path)
                         print("💾 恢复被中断的AI分析结果")
                         return temp_analysis.get('analysis', {})
 
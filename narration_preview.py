@@ -8,10 +8,11 @@
 
 import os
 import json
+from typing import Optional
 from enhanced_narration_generator import EnhancedNarrationGenerator
 
-def preview_narration_for_file(subtitle_file: str):
-    """预览单个字幕文件的旁白效果"""
+def preview_narration_for_file(subtitle_file: str, generator: Optional[EnhancedNarrationGenerator] = None):
+    """预览单个字幕文件的旁白效果（批量预览时传入同一个生成器复用）"""
     print(f"\n📺 预览旁白效果: {subtitle_file}")
     print("=" * 60)
     
@@ -25,8 +26,8 @@ def preview_narration_for_file(subtitle_file: str):
     }
     
     # 创建旁白生成器
-    ai_config = {'enabled': True}  # 可以根据实际配置调整
-    generator = EnhancedNarrationGenerator(ai_config)
+    if generator is None:
+        generator = create_preview_generator()
     
     # 生成旁白
     narration = generator.generate_segment_narration(sample_segment)
@@ -51,6 +52,11 @@ def preview_narration_for_file(subtitle_file: str):
     else:
         print("❌ 旁白生成失败")
 
+def create_preview_generator() -> EnhancedNarrationGenerator:
+    """创建预览用的旁白生成器"""
+    ai_config = {'enabled': True}  # 可以根据实际配置调整
+    return EnhancedNarrationGenerator(ai_config)
+
 def preview_all_narrations():
     """预览所有字幕文件的旁白效果"""
     print("🎙️ 批量预览旁白效果")
@@ -70,9 +76,12 @@ def preview_all_narrations():
     
     subtitle_files.sort()
     
+    # 旁白生成器只创建一次，各文件共用
+    generator = create_preview_generator()
+    
     for i, filename in enumerate(subtitle_files[:3], 1):  # 预览前3个文件
         print(f"\n📺 预览 {i}/{len(subtitle_files)}: {filename}")
-        preview_narration_for_file(filename)
+        preview_narration_for_file(filename, generator)
         
         if i < 3:
             input("\n按Enter继续下一个预览...")
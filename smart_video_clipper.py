@@ -78,95 +78,86 @@ class SmartVideoClipper:
 
             print(f"  🎯 剪辑: {segment['start_time']} --> {segment['end_time']} (实际: {actual_duration:.1f}秒)")
 
-            # 第一步：精确剪辑
-            temp_clip = output_path.replace('.mp4', '_temp.mp4')
-
+            # 剪辑和字幕叠加在同一次编码中完成，避免中间文件的二次解码和编码
+            # -ss放在-i之前快速定位，重新编码时剪切点仍然精确
             cmd = [
                 'ffmpeg',
-                '-i', video_file,
                 '-ss', str(buffer_start),
+                '-i', video_file,
                 '-t', str(actual_duration),
+                '-vf', self.build_overlay_filter(plan),
                 '-c:v', 'libx264',
                 '-c:a', 'aac',
                 '-crf', '20',  # 高质量
                 '-preset', 'medium',
                 '-movflags', '+faststart',
                 '-avoid_negative_ts', 'make_zero',
-                temp_clip,
+                output_path,
                 '-y'
             ]
 
             result = subprocess.run(cmd, capture_output=True, text=True, 
                                           timeout=300, encoding='utf-8', errors='ignore')
 
-            if result.returncode != 0:
-                print(f"    ❌ 视频剪辑失败: {result.stderr[:100]}")
-                return False
-
-            # 第二步：添加专业字幕和标题
-            success = self.add_professional_overlay(temp_clip, plan, output_path)
-
-            # 清理临时文件
-            if os.path.exists(temp_clip):
-                os.remove(temp_clip)
-
-            if success and os.path.exists(output_path):
+            if result.returncode == 0 and os.path.exists(output_path):
                 file_size = os.path.getsize(output_path) / (1024*1024)
                 print(f"    ✅ 生成短视频: {os.path.basename(output_path)} ({file_size:.1f}MB)")
                 return True
             else:
-                print(f"    ❌ 添加字幕失败")
+                print(f"    ❌ 视频剪辑失败: {result.stderr[:100]}")
                 return False
 
         except Exception as e:
             print(f"    ❌ 处理出错: {e}")
             return False
 
+    def build_overlay_filter(self, plan: Dict) -> str:
+        """构建专业字幕和标题的滤镜链"""
+        theme = plan['theme']
+        significance = plan['plot_significance']
+        highlights = ', '.join(plan['content_highlights'][:2])  # 取前2个亮点
+
+        # 清理文本，避免FFmpeg错误
+        title_text = theme.replace("'", "").replace('"', '').replace(':', '-')[:35]
+        content_text = significance.replace("'", "").replace('"', '')[:30]
+        highlight_text = highlights.replace("'", "").replace('"', '')[:40]
+
+        # 构建字幕滤镜
+        filter_parts = []
+
+        # 主标题 (0-4秒)
+        filter_parts.append(
+            f"drawtext=text='{title_text}':fontsize=28:fontcolor=white:x=(w-text_w)/2:y=60:"
+            f"box=1:boxcolor=black@0.8:boxborderw=6:enable='between(t,0,4)'"
+        )
+
+        # 剧情意义 (1-5秒)
+        filter_parts.append(
+            f"drawtext=text='{content_text}':fontsize=18:fontcolor=yellow:x=(w-text_w)/2:y=110:"
+            f"box=1:boxcolor=black@0.7:boxborderw=4:enable='between(t,1,5)'"
+        )
+
+        # 内容亮点 (6秒后)
+        filter_parts.append(
+            f"drawtext=text='{highlight_text}':fontsize=16:fontcolor=lightblue:x=(w-text_w)/2:y=(h-80):"
+            f"box=1:boxcolor=black@0.6:boxborderw=3:enable='gt(t,6)'"
+        )
+
+        # 精彩标识
+        filter_parts.append(
+            f"drawtext=text='🔥 精彩片段':fontsize=14:fontcolor=red:x=20:y=20:"
+            f"box=1:boxcolor=black@0.6:boxborderw=3:enable='gt(t,2)'"
+        )
+
+        return ",".join(filter_parts)
+
     def add_professional_overlay(self, video_path: str, plan: Dict, output_path: str) -> bool:
-        """添加专业字幕和标题"""
+        """为已剪辑的视频添加专业字幕和标题"""
         try:
-            theme = plan['theme']
-            significance = plan['plot_significance']
-            highlights = ', '.join(plan['content_highlights'][:2])  # 取前2个亮点
-
-            # 清理文本，避免FFmpeg错误
-            title_text = theme.replace("'", "").replace('"', '').replace(':', '-')[:35]
-            content_text = significance.replace("'", "").replace('"', '')[:30]
-            highlight_text = highlights.replace("'", "").replace('"', '')[:40]
-
-            # 构建字幕滤镜
-            filter_parts = []
-
-            # 主标题 (0-4秒)
-            filter_parts.append(
-                f"drawtext=text='{title_text}':fontsize=28:fontcolor=white:x=(w-text_w)/2:y=60:"
-                f"box=1:boxcolor=black@0.8:boxborderw=6:enable='between(t,0,4)'"
-            )
-
-            # 剧情意义 (1-5秒)
-            filter_parts.append(
-                f"drawtext=text='{content_text}':fontsize=18:fontcolor=yellow:x=(w-text_w)/2:y=110:"
-                f"box=1:boxcolor=black@0.7:boxborderw=4:enable='between(t,1,5)'"
-            )
-
-            # 内容亮点 (6秒后)
-            filter_parts.append(
-                f"drawtext=text='{highlight_text}':fontsize=16:fontcolor=lightblue:x=(w-text_w)/2:y=(h-80):"
-                f"box=1:boxcolor=black@0.6:boxborderw=3:enable='gt(t,6)'"
-            )
-
-            # 精彩标识
-            filter_parts.append(
-                f"drawtext=text='🔥 精彩片段':fontsize=14:fontcolor=red:x=20:y=20:"
-                f"box=1:boxcolor=black@0.6:boxborderw=3:enable='gt(t,2)'"
-            )
-
-            filter_text = ",".join(filter_parts)
-
             cmd = [
                 'ffmpeg',
                 '-i', video_path,
-                '-vf', filter_text,
+                '-vf', self.build_overlay_filter(plan),
                 '-c:a', 'copy',
                 '-c:v', 'libx264',
                 '-preset', 'medium',
@@ -12,10 +12,176 @@ import re
 import json
 import subprocess
 import hashlib
+import string
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import islice
 from typing import List, Dict, Optional, Tuple
 from datetime import datetime
 
+from utils import detect_encoding
+
+# 可选依赖：安装了orjson时用它读写分析缓存，否则使用标准库json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 常见繁体/错别字修正（均为逐字对应）
+SUBTITLE_CORRECTIONS = {
+    '防衛': '防卫', '正當': '正当', '証據': '证据', '檢察官': '检察官',
+    '發現': '发现', '決定': '决定', '選擇': '选择', '開始': '开始',
+    '結束': '结束', '問題': '问题', '機會': '机会', '聽證會': '听证会'
+}
+
+# 展开为单字映射，用str.translate一次完成全部修正
+_CORRECTION_TABLE = str.maketrans({
+    old_char: new_char
+    for old, new in SUBTITLE_CORRECTIONS.items()
+    for old_char, new_char in zip(old, new)
+    if old_char != new_char
+})
+
+# 支持的视频/字幕扩展名（视频按精确匹配优先级排序）
+VIDEO_EXTENSIONS = ('.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv')
+SUBTITLE_EXTENSIONS = ('.srt', '.txt')
+
+# 预编译的正则表达式
+_TIME_RE = re.compile(r'(\d{2}:\d{2}:\d{2}[,\.]\d{3})\s*-->\s*(\d{2}:\d{2}:\d{2}[,\.]\d{3})')
+_EPISODE_PATTERNS = [re.compile(p, re.I) for p in (r'[Ee](\d+)', r'EP(\d+)', r'第(\d+)集', r'S\d+E(\d+)')]
+_SAFE_TITLE_RE = re.compile(r'[^\w\u4e00-\u9fff\-_]')
+
+# 跨集并发AI分析的最大线程数
+MAX_AI_WORKERS = 8
+
+# 同时运行的FFmpeg剪辑进程数
+MAX_PARALLEL_CLIPS = 2
+
+# 旁白文件模板（模块加载时解析一次）
+_NARRATION_TEMPLATE = string.Template("""🎬 $title
+==================================================
+
+⏱️ 时长: $duration_seconds 秒
+🎯 戏剧价值: $dramatic_value/10
+📝 剧情意义: $plot_significance
+💥 情感冲击: $emotional_impact
+
+🎙️ 专业旁白解说:
+【开场】$opening
+【高潮】$climax
+【结尾】$conclusion
+
+💬 关键对话:
+$dialogues_block
+
+📖 内容描述:
+$description
+
+🔗 剧情连贯性:
+本片段在整体剧情中的作用和与其他片段的关联。
+""")
+
+
+def _dump_json_bytes(data) -> bytes:
+    """序列化为带缩进的UTF-8 JSON字节串"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+def _load_json_bytes(raw: bytes):
+    """解析UTF-8 JSON字节串"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+# AI响应中的 ```json 代码块
+_JSON_FENCE_RE = re.compile(r'```(?:json)?\s*(.*?)```', re.S)
+_JSON_DECODER = json.JSONDecoder()
+
+
+def _extract_json_object(text: str, required_keys: Tuple[str, ...] = ()) -> Optional[Dict]:
+    """从文本中找出第一个包含所需字段的JSON对象，前后的说明文字不影响解析"""
+    pos = text.find('{')
+    while pos != -1:
+        try:
+            obj, end = _JSON_DECODER.raw_decode(text, pos)
+        except ValueError:
+            pos = text.find('{', pos + 1)
+            continue
+        if isinstance(obj, dict) and all(key in obj for key in required_keys):
+            return obj
+        # 完整解析出的对象不符合要求，跳过整个对象继续查找
+        pos = text.find('{', end)
+    return None
+
+
+def _write_text_file(path: str, content: str):
+    """写入文本文件（供后台线程调用）"""
+    try:
+        with open(path, 'w', encoding='utf-8', buffering=1 << 16) as f:
+            f.write(content)
+    except Exception as e:
+        print(f"   ⚠️ 写入失败 {os.path.basename(path)}: {e}")
+
+@lru_cache(maxsize=4096)
+def _srt_time_to_seconds(time_str: str) -> float:
+    """SRT时间转换为秒（结果缓存，同一时间戳只解析一次）"""
+    # 标准定长格式 HH:MM:SS,mmm 直接按位置切片
+    if len(time_str) == 12 and time_str[2] == ':' and time_str[5] == ':' and time_str[8] in ',.':
+        try:
+            return (int(time_str[0:2]) * 3600 + int(time_str[3:5]) * 60
+                    + int(time_str[6:8]) + int(time_str[9:12]) / 1000)
+        except ValueError:
+            pass
+
+    # 非标准格式回退到通用解析
+    try:
+        time_str = time_str.replace('.', ',')
+        h, m, s_ms = time_str.split(':')
+        s, ms = s_ms.split(',')
+        return int(h) * 3600 + int(m) * 60 + int(s) + int(ms) / 1000
+    except:
+        return 0.0
+
+class SubtitleTrack:
+    """按列存储的字幕序列：序号、起止时间、文本各为一个并行列表，避免逐条建dict"""
+    __slots__ = ('indices', 'starts', 'ends', 'texts')
+
+    def __init__(self):
+        self.indices: List[int] = []
+        self.starts: List[str] = []
+        self.ends: List[str] = []
+        self.texts: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def append(self, index: int, start: str, end: str, text: str):
+        self.indices.append(index)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.texts.append(text)
+
+    def content_hash(self) -> str:
+        """逐条增量计算缓存键：与按行dict列表 json.dumps(sort_keys=True, ensure_ascii=False) 的md5前16位一致，
+        已有的分析缓存继续有效，且不生成整段JSON文本"""
+        dumps = json.dumps
+        digest = hashlib.md5()
+        update = digest.update
+        separator = b'['
+        for index, start, end, text in zip(self.indices, self.starts, self.ends, self.texts):
+            update(separator)
+            update(
+                f'{{"end": {dumps(end, ensure_ascii=False)}, "index": {index}, '
+                f'"start": {dumps(start, ensure_ascii=False)}, "text": {dumps(text, ensure_ascii=False)}}}'.encode()
+            )
+            separator = b', '
+        update(b'[]' if separator == b'[' else b']')
+        return digest.hexdigest()[:16]
+
 class UnifiedIntelligentClipper:
     def __init__(self):
         # 标准目录结构
@@ -31,6 +197,21 @@ class UnifiedIntelligentClipper:
         # 加载AI配置
         self.ai_config = self._load_ai_config()
         
+        # 视频文件索引（小写文件名 -> 路径），每轮批处理开始时重建
+        self._video_index: Optional[Dict[str, str]] = None
+        # 集数 -> 视频路径，只收录集数唯一的视频
+        self._video_episode_index: Dict[str, str] = {}
+        
+        # 旁白等文本文件在后台线程写入，与下一个片段的FFmpeg剪辑重叠
+        self._writer = ThreadPoolExecutor(max_workers=2)
+        self._pending_writes = []
+        
+        # 字幕文件路径 -> 检测到的编码
+        self._encoding_cache: Dict[str, str] = {}
+        
+        # 共享HTTP会话，各集API调用复用keep-alive连接
+        self._http = requests.Session()
+        
         print("🚀 统一智能剪辑系统已初始化")
         print(f"📁 字幕目录: {self.srt_folder}/")
         print(f"🎬 视频目录: {self.video_folder}/")
@@ -52,78 +233,98 @@ class UnifiedIntelligentClipper:
         print("📝 使用基础规则分析")
         return {'enabled': False}
 
-    def parse_subtitle_file(self, filepath: str) -> List[Dict]:
+    def parse_subtitle_file(self, filepath: str) -> SubtitleTrack:
         """解析字幕文件，智能错误修正"""
         print(f"📖 解析字幕: {os.path.basename(filepath)}")
         
-        # 尝试不同编码
-        content = None
-        for encoding in ['utf-8', 'gbk', 'utf-16']:
-            try:
-                with open(filepath, 'r', encoding=encoding, errors='ignore') as f:
-                    content = f.read()
-                    break
-            except:
-                continue
+        content = self._read_subtitle_text(filepath)
         
         if not content:
             print(f"❌ 无法读取文件: {filepath}")
-            return []
+            return SubtitleTrack()
         
         # 智能错别字修正
-        corrections = {
-            '防衛': '防卫', '正當': '正当', '証據': '证据', '檢察官': '检察官',
-            '發現': '发现', '決定': '决定', '選擇': '选择', '開始': '开始',
-            '結束': '结束', '問題': '问题', '機會': '机会', '聽證會': '听证会'
-        }
+        content = content.translate(_CORRECTION_TABLE)
         
-        for old, new in corrections.items():
-            content = content.replace(old, new)
+        # 解析字幕条目：逐行扫描一次，空行结束当前条目
+        subtitles = SubtitleTrack()
+        block = []
         
-        # 解析字幕条目
-        subtitles = []
-        blocks = re.split(r'\n\s*\n', content.strip())
+        for line in content.splitlines():
+            if line.strip():
+                block.append(line)
+            elif block:
+                self._append_subtitle_block(block, subtitles)
+                block = []
         
-        for block in blocks:
-            lines = block.strip().split('\n')
-            if len(lines) >= 3:
-                try:
-                    index = int(lines[0]) if lines[0].isdigit() else len(subtitles) + 1
-                    
-                    # 匹配时间格式
-                    time_pattern = r'(\d{2}:\d{2}:\d{2}[,\.]\d{3})\s*-->\s*(\d{2}:\d{2}:\d{2}[,\.]\d{3})'
-                    time_match = re.search(time_pattern, lines[1])
-                    
-                    if time_match:
-                        start_time = time_match.group(1).replace('.', ',')
-                        end_time = time_match.group(2).replace('.', ',')
-                        text = '\n'.join(lines[2:]).strip()
-                        
-                        if text:
-                            subtitles.append({
-                                'index': index,
-                                'start': start_time,
-                                'end': end_time,
-                                'text': text
-                            })
-                except (ValueError, IndexError):
-                    continue
+        if block:
+            self._append_subtitle_block(block, subtitles)
         
         print(f"✅ 解析完成: {len(subtitles)} 条字幕")
         return subtitles
 
-    def get_analysis_cache_key(self, subtitles: List[Dict]) -> str:
+    def _read_subtitle_text(self, filepath: str) -> Optional[str]:
+        """一次读取字幕字节，按严格解码结果确定编码（同一文件只检测一次）"""
+        try:
+            with open(filepath, 'rb') as f:
+                raw = f.read()
+        except OSError:
+            return None
+        
+        encoding = self._encoding_cache.get(filepath)
+        if encoding:
+            return raw.decode(encoding, errors='ignore')
+        
+        # errors='ignore'下utf-8解码总会"成功"，gbk字幕会变成乱码，所以必须严格解码
+        for encoding in ['utf-8-sig', 'gbk', 'utf-16']:
+            try:
+                content = raw.decode(encoding)
+            except UnicodeDecodeError:
+                continue
+            self._encoding_cache[filepath] = encoding
+            return content
+        
+        # 常见编码都不匹配时，安装了charset_normalizer则用它检测
+        encoding = detect_encoding(raw)
+        if encoding:
+            self._encoding_cache[filepath] = encoding
+            return raw.decode(encoding, errors='replace')
+        
+        return raw.decode('utf-8', errors='ignore')
+
+    def _append_subtitle_block(self, lines: List[str], subtitles: SubtitleTrack):
+        """解析一个字幕条目（序号行、时间行、文本行）并追加到列表"""
+        if len(lines) < 3:
+            return
+        
+        try:
+            index_line = lines[0].strip()
+            index = int(index_line) if index_line.isdigit() else len(subtitles) + 1
+        except ValueError:
+            return
+        
+        # 匹配时间格式
+        time_match = _TIME_RE.search(lines[1])
+        
+        if time_match:
+            start_time = time_match.group(1).replace('.', ',')
+            end_time = time_match.group(2).replace('.', ',')
+            text = '\n'.join(lines[2:]).strip()
+            
+            if text:
+                subtitles.append(index, start_time, end_time, text)
+
+    def get_analysis_cache_key(self, subtitles: SubtitleTrack) -> str:
         """生成分析缓存键"""
-        content = json.dumps(subtitles, ensure_ascii=False, sort_keys=True)
-        return hashlib.md5(content.encode()).hexdigest()[:16]
+        return subtitles.content_hash()
 
     def load_analysis_cache(self, cache_key: str, filename: str) -> Optional[Dict]:
         """加载分析缓存"""
         cache_file = os.path.join(self.cache_folder, f"{filename}_{cache_key}.json")
         if os.path.exists(cache_file):
             try:
-                with open(cache_file, 'r', encoding='utf-8') as f:
-                    analysis = json.load(f)
+                with open(cache_file, 'rb') as f:
+                    analysis = _load_json_bytes(f.read())
                     print(f"💾 使用缓存分析: {filename}")
                     return analysis
             except Exception as e:
@@ -134,13 +335,13 @@ class UnifiedIntelligentClipper:
         """保存分析缓存"""
         cache_file = os.path.join(self.cache_folder, f"{filename}_{cache_key}.json")
         try:
-            with open(cache_file, 'w', encoding='utf-8') as f:
-                json.dump(analysis, f, ensure_ascii=False, indent=2)
+            with open(cache_file, 'wb') as f:
+                f.write(_dump_json_bytes(analysis))
             print(f"💾 保存分析缓存: {filename}")
         except Exception as e:
             print(f"⚠️ 缓存保存失败: {e}")
 
-    def ai_analyze_complete_episode(self, subtitles: List[Dict], filename: str) -> Dict:
+    def ai_analyze_complete_episode(self, subtitles: SubtitleTrack, filename: str) -> Dict:
         """AI完整分析单集"""
         # 检查缓存
         cache_key = self.get_analysis_cache_key(subtitles)
@@ -163,19 +364,14 @@ class UnifiedIntelligentClipper:
         
         return analysis
 
-    def _build_complete_context(self, subtitles: List[Dict]) -> str:
+    def _build_complete_context(self, subtitles: SubtitleTrack) -> str:
         """构建完整上下文，避免割裂"""
         # 取前80%内容作为分析样本
         sample_size = int(len(subtitles) * 0.8)
-        context_parts = []
-        
-        # 每50句分一段，保持上下文
-        for i in range(0, sample_size, 50):
-            segment = subtitles[i:i+50]
-            segment_text = ' '.join([sub['text'] for sub in segment])
-            context_parts.append(segment_text)
+        texts = iter(subtitles.texts)
         
-        return '\n\n'.join(context_parts)
+        # 每50句分一段，保持上下文；共享迭代器逐段消费，不再为每段切片复制列表
+        return '\n\n'.join(' '.join(islice(texts, 50)) for _ in range(0, sample_size, 50))
 
     def _call_ai_analysis(self, context: str, episode_num: str, filename: str) -> Dict:
         """调用AI进行完整分析"""
@@ -256,7 +452,7 @@ class UnifiedIntelligentClipper:
                 'temperature': 0.7
             }
             
-            response = requests.post(
+            response = self._http.post(
                 f"{config.get('base_url', 'https://api.openai.com/v1')}/chat/completions",
                 headers=headers,
                 json=data,
@@ -276,27 +472,20 @@ class UnifiedIntelligentClipper:
 
     def _parse_ai_response(self, response: str) -> Optional[Dict]:
         """解析AI响应"""
-        try:
-            # 提取JSON内容
-            if "```json" in response:
-                start = response.find("```json") + 7
-                end = response.find("```", start)
-                json_text = response[start:end]
-            else:
-                start = response.find("{")
-                end = response.rfind("}") + 1
-                json_text = response[start:end]
-            
-            analysis = json.loads(json_text)
-            
-            # 验证必要字段
-            if 'highlight_segments' in analysis and 'episode_analysis' in analysis:
+        # 验证必要字段
+        required_keys = ('highlight_segments', 'episode_analysis')
+        
+        # 优先解析代码块内容，再在整段响应中查找；raw_decode从'{'处解析到对象结束，不需要rfind
+        fence = _JSON_FENCE_RE.search(response)
+        if fence:
+            analysis = _extract_json_object(fence.group(1), required_keys)
+            if analysis is not None:
                 return analysis
-                
-        except json.JSONDecodeError as e:
-            print(f"⚠️ JSON解析失败: {e}")
         
-        return None
+        analysis = _extract_json_object(response, required_keys)
+        if analysis is None:
+            print("⚠️ JSON解析失败: 未找到有效的分析结果")
+        return analysis
 
     def _basic_analysis_fallback(self, filename: str, episode_num: str) -> Dict:
         """基础分析备选方案"""
@@ -332,35 +521,79 @@ class UnifiedIntelligentClipper:
             }
         }
 
+    def _build_video_index(self) -> Dict[str, str]:
+        """用os.scandir扫描一次视频目录，建立小写文件名（不含扩展名）到路径的索引"""
+        candidates = []
+        try:
+            with os.scandir(self.video_folder) as entries:
+                for entry in entries:
+                    base, ext = os.path.splitext(entry.name)
+                    ext = ext.lower()
+                    if ext in VIDEO_EXTENSIONS and entry.is_file():
+                        candidates.append((VIDEO_EXTENSIONS.index(ext), entry.name, base.lower()))
+        except OSError:
+            pass
+        
+        # 同名多个扩展名时按VIDEO_EXTENSIONS优先级保留
+        index = {}
+        for _, filename, key in sorted(candidates):
+            index.setdefault(key, os.path.join(self.video_folder, filename))
+        
+        # 按集数建立第二个索引；多个视频对应同一集数时该集数不收录，交给模糊匹配
+        episode_index = {}
+        ambiguous = set()
+        for key, video_path in index.items():
+            episode = self._extract_episode_number(key)
+            if episode == "00" or episode in ambiguous:
+                continue
+            if episode in episode_index:
+                del episode_index[episode]
+                ambiguous.add(episode)
+            else:
+                episode_index[episode] = video_path
+        
+        self._video_index = index
+        self._video_episode_index = episode_index
+        return index
+
     def find_matching_video(self, subtitle_filename: str) -> Optional[str]:
         """智能匹配视频文件"""
-        base_name = os.path.splitext(subtitle_filename)[0]
+        video_index = self._video_index
+        if video_index is None:
+            video_index = self._build_video_index()
+        
+        base_name = os.path.splitext(subtitle_filename)[0].lower()
         
         # 精确匹配
-        video_extensions = ['.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv']
-        for ext in video_extensions:
-            video_path = os.path.join(self.video_folder, base_name + ext)
-            if os.path.exists(video_path):
+        video_path = video_index.get(base_name)
+        if video_path:
+            return video_path
+        
+        # 按集数匹配
+        episode = self._extract_episode_number(base_name)
+        if episode != "00":
+            video_path = self._video_episode_index.get(episode)
+            if video_path:
                 return video_path
         
         # 模糊匹配
-        for filename in os.listdir(self.video_folder):
-            if any(filename.lower().endswith(ext) for ext in video_extensions):
-                if base_name.lower() in filename.lower():
-                    return os.path.join(self.video_folder, filename)
+        for key, video_path in video_index.items():
+            if base_name in key:
+                return video_path
         
         return None
 
     def create_video_clips(self, analysis: Dict, video_file: str, subtitle_filename: str) -> List[str]:
         """创建视频片段 - 解决问题13,14：保证一致性和断点续传"""
         created_clips = []
+        running = []
         
         for segment in analysis.get('highlight_segments', []):
             segment_id = segment['segment_id']
             title = segment['title']
             
             # 生成一致的文件名
-            safe_title = re.sub(r'[^\w\u4e00-\u9fff\-_]', '_', title)
+            safe_title = _SAFE_TITLE_RE.sub('_', title)
             clip_filename = f"{safe_title}_seg{segment_id}.mp4"
             clip_path = os.path.join(self.output_folder, clip_filename)
             
@@ -370,16 +603,40 @@ class UnifiedIntelligentClipper:
                 created_clips.append(clip_path)
                 continue
             
-            # 剪辑视频
-            if self._create_single_clip(video_file, segment, clip_path):
-                created_clips.append(clip_path)
-                # 生成旁白文件 - 解决问题7
-                self._create_narration_file(clip_path, segment)
+            # 剪辑视频：后台启动FFmpeg，达到并发上限时先收取最早启动的片段
+            process = self._start_clip(video_file, segment, clip_path)
+            if process is None:
+                continue
+            running.append((process, clip_path, segment))
+            if len(running) >= MAX_PARALLEL_CLIPS:
+                self._collect_clip(*running.pop(0), created_clips)
+        
+        for process, clip_path, segment in running:
+            self._collect_clip(process, clip_path, segment, created_clips)
         
+        self._wait_pending_writes()
         return created_clips
 
+    def _collect_clip(self, process: subprocess.Popen, clip_path: str, segment: Dict, created_clips: List[str]):
+        """等待片段剪辑完成，成功后生成旁白文件"""
+        if self._finish_clip(process, clip_path):
+            created_clips.append(clip_path)
+            # 生成旁白文件 - 解决问题7
+            self._create_narration_file(clip_path, segment)
+
+    def _wait_pending_writes(self):
+        """等待后台文件写入全部完成"""
+        for future in self._pending_writes:
+            future.result()
+        self._pending_writes.clear()
+
     def _create_single_clip(self, video_file: str, segment: Dict, output_path: str) -> bool:
         """创建单个视频片段"""
+        process = self._start_clip(video_file, segment, output_path)
+        return process is not None and self._finish_clip(process, output_path)
+
+    def _start_clip(self, video_file: str, segment: Dict, output_path: str) -> Optional[subprocess.Popen]:
+        """启动剪辑单个片段的FFmpeg进程，不等待完成"""
         try:
             start_time = segment['start_time']
             end_time = segment['end_time']
@@ -394,15 +651,17 @@ class UnifiedIntelligentClipper:
             
             if duration <= 0:
                 print(f"   ❌ 无效时间段")
-                return False
+                return None
             
             # 添加缓冲确保对话完整 - 解决问题11
             buffer_start = max(0, start_seconds - 2)
             buffer_duration = duration + 4
             
-            # FFmpeg命令
+            # FFmpeg命令（只输出错误信息，避免并发进程写满stderr管道）
             cmd = [
                 'ffmpeg',
+                '-hide_banner',
+                '-loglevel', 'error',
                 '-i', video_file,
                 '-ss', str(buffer_start),
                 '-t', str(buffer_duration),
@@ -415,19 +674,31 @@ class UnifiedIntelligentClipper:
                 '-y'
             ]
             
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
-            
-            if result.returncode == 0 and os.path.exists(output_path):
-                file_size = os.path.getsize(output_path) / (1024*1024)
-                print(f"   ✅ 成功: {file_size:.1f}MB")
-                return True
-            else:
-                print(f"   ❌ 失败: {result.stderr[:100] if result.stderr else '未知错误'}")
-                return False
+            return subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
                 
         except Exception as e:
             print(f"   ❌ 剪辑异常: {e}")
+            return None
+
+    def _finish_clip(self, process: subprocess.Popen, output_path: str) -> bool:
+        """等待FFmpeg进程结束并检查输出文件"""
+        clip_name = os.path.basename(output_path)
+        try:
+            _, stderr = process.communicate(timeout=300)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            print(f"   ❌ {clip_name} 剪辑超时")
             return False
+        
+        if process.returncode == 0 and os.path.exists(output_path):
+            file_size = os.path.getsize(output_path) / (1024*1024)
+            print(f"   ✅ {clip_name}: {file_size:.1f}MB")
+            return True
+        
+        error_msg = stderr.decode('utf-8', 'replace')[:100] if stderr else '未知错误'
+        print(f"   ❌ {clip_name} 失败: {error_msg}")
+        return False
 
     def _create_narration_file(self, video_path: str, segment: Dict):
         """创建旁白文件 - 解决问题7,10"""
@@ -435,37 +706,22 @@ class UnifiedIntelligentClipper:
             narration_path = video_path.replace('.mp4', '_旁白.txt')
             
             narration = segment.get('narration', {})
+            dialogues_block = "".join(f"• {dialogue}\n" for dialogue in segment.get('key_dialogues', []))
+            
+            content = _NARRATION_TEMPLATE.substitute(
+                title=segment['title'],
+                duration_seconds=segment['duration_seconds'],
+                dramatic_value=segment['dramatic_value'],
+                plot_significance=segment['plot_significance'],
+                emotional_impact=segment['emotional_impact'],
+                opening=narration.get('opening', ''),
+                climax=narration.get('climax', ''),
+                conclusion=narration.get('conclusion', ''),
+                dialogues_block=dialogues_block,
+                description=segment['description']
+            )
             
-            content = f"""🎬 {segment['title']}
-{'=' * 50}
-
-⏱️ 时长: {segment['duration_seconds']} 秒
-🎯 戏剧价值: {segment['dramatic_value']}/10
-📝 剧情意义: {segment['plot_significance']}
-💥 情感冲击: {segment['emotional_impact']}
-
-🎙️ 专业旁白解说:
-【开场】{narration.get('opening', '')}
-【高潮】{narration.get('climax', '')}
-【结尾】{narration.get('conclusion', '')}
-
-💬 关键对话:
-"""
-            
-            for dialogue in segment.get('key_dialogues', []):
-                content += f"• {dialogue}\n"
-            
-            content += f"""
-
-📖 内容描述:
-{segment['description']}
-
-🔗 剧情连贯性:
-本片段在整体剧情中的作用和与其他片段的关联。
-"""
-            
-            with open(narration_path, 'w', encoding='utf-8') as f:
-                f.write(content)
+            self._pending_writes.append(self._writer.submit(_write_text_file, narration_path, content))
             
             print(f"   📄 旁白文件: {os.path.basename(narration_path)}")
             
@@ -474,43 +730,61 @@ class UnifiedIntelligentClipper:
 
     def _extract_episode_number(self, filename: str) -> str:
         """提取集数"""
-        patterns = [r'[Ee](\d+)', r'EP(\d+)', r'第(\d+)集', r'S\d+E(\d+)']
-        for pattern in patterns:
-            match = re.search(pattern, filename, re.I)
+        for pattern in _EPISODE_PATTERNS:
+            match = pattern.search(filename)
             if match:
                 return match.group(1).zfill(2)
         return "00"
 
     def _time_to_seconds(self, time_str: str) -> float:
         """时间转换为秒"""
-        try:
-            time_str = time_str.replace('.', ',')
-            h, m, s_ms = time_str.split(':')
-            s, ms = s_ms.split(',')
-            return int(h) * 3600 + int(m) * 60 + int(s) + int(ms) / 1000
-        except:
-            return 0.0
-
-    def process_single_episode(self, subtitle_file: str) -> bool:
-        """处理单集完整流程 - 解决问题15：执行一致性"""
-        print(f"\n📺 处理: {subtitle_file}")
-        
-        # 1. 解析字幕
+        return _srt_time_to_seconds(time_str)
+
+    def _prepare_episode(self, subtitle_file: str) -> Optional[Tuple[SubtitleTrack, Dict]]:
+        """解析字幕并完成AI分析（带缓存），解析失败返回None"""
         subtitle_path = os.path.join(self.srt_folder, subtitle_file)
         subtitles = self.parse_subtitle_file(subtitle_path)
-        
         if not subtitles:
+            return None
+        
+        return subtitles, self.ai_analyze_complete_episode(subtitles, subtitle_file)
+
+    def _prepare_all_episodes(self, subtitle_files: List[str]) -> Dict[str, Optional[Tuple[SubtitleTrack, Dict]]]:
+        """并发完成各集的AI分析，网络等待互相重叠"""
+        workers = min(len(subtitle_files), MAX_AI_WORKERS)
+        print(f"🤖 并发分析 {len(subtitle_files)} 集 (线程数: {workers})")
+        
+        prepared = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {name: executor.submit(self._prepare_episode, name) for name in subtitle_files}
+            for name, future in futures.items():
+                try:
+                    prepared[name] = future.result()
+                except Exception as e:
+                    # 分析失败的集数留给逐集流程重试
+                    print(f"⚠️ {name} 预分析失败: {e}")
+        return prepared
+
+    def process_single_episode(self, subtitle_file: str,
+                               prepared: Optional[Tuple[SubtitleTrack, Dict]] = None) -> int:
+        """处理单集完整流程 - 解决问题15：执行一致性，返回生成的片段数"""
+        print(f"\n📺 处理: {subtitle_file}")
+        
+        # 1-2. 解析字幕 + AI分析 (带缓存)，已预分析时直接复用
+        if prepared is None:
+            prepared = self._prepare_episode(subtitle_file)
+        
+        if not prepared:
             print(f"❌ 字幕解析失败")
-            return False
+            return 0
         
-        # 2. AI分析 (带缓存)
-        analysis = self.ai_analyze_complete_episode(subtitles, subtitle_file)
+        subtitles, analysis = prepared
         
         # 3. 找到视频文件
         video_file = self.find_matching_video(subtitle_file)
         if not video_file:
             print(f"❌ 未找到视频文件")
-            return False
+            return 0
         
         print(f"📁 视频文件: {os.path.basename(video_file)}")
         
@@ -521,7 +795,7 @@ class UnifiedIntelligentClipper:
         self._create_episode_summary(subtitle_file, analysis, created_clips)
         
         print(f"✅ {subtitle_file} 处理完成: {len(created_clips)} 个片段")
-        return len(created_clips) > 0
+        return len(created_clips)
 
     def _create_episode_summary(self, subtitle_file: str, analysis: Dict, clips: List[str]):
         """创建集数总结"""
@@ -578,32 +852,38 @@ class UnifiedIntelligentClipper:
         print("=" * 60)
         
         # 检查目录和文件
-        subtitle_files = [f for f in os.listdir(self.srt_folder) 
-                         if f.endswith(('.srt', '.txt')) and not f.startswith('.')]
+        with os.scandir(self.srt_folder) as entries:
+            subtitle_files = sorted(
+                entry.name for entry in entries
+                if entry.name.endswith(SUBTITLE_EXTENSIONS) and not entry.name.startswith('.')
+                and entry.is_file()
+            )
         
         if not subtitle_files:
             print(f"❌ {self.srt_folder}/ 目录中未找到字幕文件")
             return
         
-        subtitle_files.sort()
-        
         print(f"📝 找到 {len(subtitle_files)} 个字幕文件")
+        
+        # 视频目录只扫描一次，供各集匹配复用
+        self._build_video_index()
         print(f"🤖 AI分析: {'启用' if self.ai_config.get('enabled') else '未启用'}")
         
+        # AI分析阶段以网络等待为主，先跨集并发完成，每集结果各自写入缓存
+        prepared = {}
+        if self.ai_config.get('enabled') and len(subtitle_files) > 1:
+            prepared = self._prepare_all_episodes(subtitle_files)
+        
         # 处理每一集
         total_success = 0
         total_clips = 0
         
         for subtitle_file in subtitle_files:
             try:
-                success = self.process_single_episode(subtitle_file)
-                if success:
+                clip_count = self.process_single_episode(subtitle_file, prepared.get(subtitle_file))
+                if clip_count > 0:
                     total_success += 1
-                
-                # 统计片段数
-                episode_clips = [f for f in os.listdir(self.output_folder) 
-                               if f.startswith(os.path.splitext(subtitle_file)[0]) and f.endswith('.mp4')]
-                total_clips += len(episode_clips)
+                total_clips += clip_count
                 
             except Exception as e:
                 print(f"❌ 处理 {subtitle_file} 出错: {e}")
@@ -8,8 +8,14 @@
 
 import os
 import re
+import sys
 import json
-from typing import Dict, Any, List, Optional
+import codecs
+import subprocess
+from typing import Dict, Any, List, Optional, Tuple
+
+# 检测字幕编码时读取的文件开头采样字节数
+ENCODING_SAMPLE_BYTES = 64 * 1024
 
 def extract_episode_number(filename: str) -> str:
     """从SRT文件名提取集数，使用字符串排序"""
@@ -80,6 +86,123 @@ def validate_ai_config(config: Dict[str, Any]) -> bool:
     
     return True
 
+def detect_encoding(raw: bytes) -> Optional[str]:
+    """用charset_normalizer检测编码（可选依赖，未安装或检测失败返回None）"""
+    try:
+        from charset_normalizer import from_bytes
+    except ImportError:
+        return None
+    best = from_bytes(raw).best()
+    return best.encoding if best else None
+
+def _decodes_cleanly(sample: bytes, encoding: str, final: bool) -> bool:
+    """严格解码文件开头的采样，判断文件是否为该编码；采样不是完整文件时允许末尾截断半个字符"""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    try:
+        decoder.decode(sample, final=final)
+    except UnicodeError:
+        return False
+    return True
+
+def _sniff_bom(head: bytes) -> Optional[str]:
+    """根据文件开头的BOM判断编码，没有BOM时返回None"""
+    if head.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+    return None
+
+def detect_subtitle_encoding(filepath: str) -> Tuple[str, str]:
+    """按文件开头的采样检测字幕编码，返回(编码, 解码错误处理方式)，不一次读入整个文件"""
+    with open(filepath, 'rb') as f:
+        sample = f.read(ENCODING_SAMPLE_BYTES)
+    
+    # 有BOM时编码是确定的，无需逐个尝试解码
+    encoding = _sniff_bom(sample)
+    if encoding:
+        return encoding, 'ignore'
+    
+    # 严格解码才能区分编码，避免errors='ignore'下utf-8总是"成功"产生乱码；
+    # 只解码已读取的采样，不为每个候选编码重新读取整个文件。
+    # 字幕文本不含NUL字节，出现NUL说明是没有BOM的UTF-16（只看采样时GBK也可能碰巧解码成功），
+    # 按本机字节序解码（与bytes.decode('utf-16')一致）
+    is_whole_file = len(sample) < ENCODING_SAMPLE_BYTES
+    native_utf16 = 'utf-16-le' if sys.byteorder == 'little' else 'utf-16-be'
+    for encoding in ([native_utf16] if b'\x00' in sample else ['utf-8', 'gbk']):
+        if _decodes_cleanly(sample, encoding, is_whole_file):
+            return encoding, 'ignore'
+    
+    # 常见编码都不匹配时，安装了charset_normalizer则用文件开头的采样检测
+    encoding = detect_encoding(sample)
+    if encoding:
+        return encoding, 'replace'
+    
+    return 'utf-8', 'ignore'
+
+def run_ffmpeg(cmd: List[str], output_path: str, max_error_chars: int = 200) -> Tuple[bool, str]:
+    """运行FFmpeg命令，返回(是否成功, 错误信息)"""
+    # 成功时不需要输出，stderr保留为字节，仅失败时解码
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=300)
+    
+    if result.returncode == 0 and os.path.exists(output_path):
+        return True, ''
+    
+    error_msg = result.stderr.decode('utf-8', 'replace')[:max_error_chars] if result.stderr else '未知错误'
+    return False, error_msg
+
+def snap_to_keyframe(video_file: str, start_seconds: float, duration: float,
+                     cache: Optional[Dict[Tuple[str, float], float]] = None) -> Tuple[float, float]:
+    """流复制只能从关键帧开始：把起点提前到其前一个关键帧并相应延长时长，保证目标片段完整；
+    cache为(视频文件, 起始秒数) -> 关键帧秒数的缓存字典"""
+    if start_seconds <= 0:
+        return start_seconds, duration
+    
+    cache_key = (video_file, start_seconds)
+    keyframe = cache.get(cache_key) if cache is not None else None
+    if keyframe is None:
+        keyframes = []
+        try:
+            # 定位到起点时ffprobe会从前一个关键帧开始读取，只需读到起点为止
+            result = subprocess.run(
+                ['ffprobe', '-v', 'error', '-select_streams', 'v:0',
+                 '-read_intervals', f'{start_seconds}%{start_seconds + 0.001}',
+                 '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', video_file],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                timeout=30
+            )
+            for line in result.stdout.decode('ascii', 'ignore').splitlines():
+                pts, _, flags = line.partition(',')
+                try:
+                    pts_time = float(pts)
+                except ValueError:
+                    continue
+                if 'K' in flags and pts_time <= start_seconds:
+                    keyframes.append(pts_time)
+        except (OSError, subprocess.SubprocessError):
+            pass
+        keyframe = max(keyframes, default=start_seconds)
+        if cache is not None:
+            cache[cache_key] = keyframe
+    
+    return keyframe, duration + (start_seconds - keyframe)
+
+def clip_duration_matches(clip_path: str, expected: float, tolerance: float = 0.5) -> bool:
+    """用ffprobe检查片段时长是否与目标一致；无法检测时视为一致"""
+    try:
+        result = subprocess.run(
+            ['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
+             '-of', 'default=noprint_wrappers=1:nokey=1', clip_path],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            timeout=30
+        )
+        actual = float(result.stdout.strip())
+    except (OSError, ValueError, subprocess.SubprocessError):
+        return True
+    
+    return abs(actual - expected) <= tolerance
+
 def format_time_to_seconds(time_str: str) -> float:
     """将时间字符串转换为秒数"""
     try:
@@ -187,11 +187,15 @@ class VideoClipper:
                                           encoding='utf-8', errors='ignore')
 
             if result.returncode == 0:
-                os.remove(video_path)
-                os.rename(output_path, video_path)
+                # 原子替换原视频，无需先删除
+                os.replace(output_path, video_path)
                 print(f"    ✓ 添加专业标题完成")
                 return video_path
             else:
+                try:
+                    os.remove(output_path)
+                except FileNotFoundError:
+                    pass
                 print(f"    ⚠ 添加标题失败，保留原视频: {result.stderr}")
                 return video_path
 